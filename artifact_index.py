@@ -0,0 +1,170 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+# SQLite file recording every processed document and the files generated for it
+ARTIFACT_INDEX_PATH = 'artifacts.db'
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS documents (
+    workspace TEXT PRIMARY KEY,
+    filename TEXT NOT NULL,
+    file_hash TEXT NOT NULL,
+    upload_path TEXT NOT NULL,
+    pages_text INTEGER,
+    pages_ocr INTEGER,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS documents_updated ON documents (updated_at);
+CREATE TABLE IF NOT EXISTS artifacts (
+    workspace TEXT NOT NULL REFERENCES documents (workspace),
+    name TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    path TEXT NOT NULL,
+    size_bytes INTEGER,
+    sha256 TEXT,
+    mtime REAL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (workspace, name)
+);
+CREATE INDEX IF NOT EXISTS artifacts_name ON artifacts (name, created_at);
+'''
+
+
+def artifact_kind(name):
+    # csv, xlsx, pdf, ... from the file extension
+    return os.path.splitext(name)[1].lstrip('.').lower()
+
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    # Content hash of a generated file, read in chunks so large workbooks stay out of memory
+    digest = hashlib.sha256()
+    with open(path, 'rb') as artifact:
+        for chunk in iter(lambda: artifact.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _page_count(pages, route):
+    # Routes are page counts, except 'all' when the whole document went through OCR
+    value = (pages or {}).get(route)
+    return value if isinstance(value, int) else None
+
+
+class ArtifactIndex:
+    # Lookups are single indexed queries, so downloads and listings never scan the
+    # csv/, excel/ or uploads/ folders no matter how many sheets were processed
+    def __init__(self, path=ARTIFACT_INDEX_PATH):
+        self.path = path
+        # One connection shared by request threads and job workers, guarded by a lock
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            if path != ':memory:':
+                self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.executescript(SCHEMA)
+
+    def record_document(self, workspace, filename, file_hash, upload_path, pages=None):
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                '''INSERT INTO documents (workspace, filename, file_hash, upload_path, pages_text, pages_ocr,
+                                          created_at, updated_at)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                   ON CONFLICT (workspace) DO UPDATE SET
+                       updated_at = excluded.updated_at,
+                       pages_text = COALESCE(excluded.pages_text, pages_text),
+                       pages_ocr = COALESCE(excluded.pages_ocr, pages_ocr)''',
+                (workspace, filename, file_hash, upload_path, _page_count(pages, 'text'),
+                 _page_count(pages, 'ocr'), now, now))
+
+    def record_artifact(self, workspace, path, name=None):
+        # The content hash taken here is the download ETag, so it is computed once per write
+        name = name or os.path.basename(path)
+        size = sha256 = mtime = None
+        if os.path.exists(path):
+            size, mtime, sha256 = os.path.getsize(path), os.path.getmtime(path), file_sha256(path)
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                '''INSERT INTO artifacts (workspace, name, kind, path, size_bytes, sha256, mtime, created_at)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                   ON CONFLICT (workspace, name) DO UPDATE SET
+                       path = excluded.path, size_bytes = excluded.size_bytes, sha256 = excluded.sha256,
+                       mtime = excluded.mtime, created_at = excluded.created_at''',
+                (workspace, name, artifact_kind(name), path, size, sha256, mtime, now))
+            self._conn.execute('UPDATE documents SET updated_at = ? WHERE workspace = ?', (now, workspace))
+
+    def get_document(self, workspace):
+        with self._lock:
+            row = self._conn.execute('SELECT * FROM documents WHERE workspace = ?', (workspace,)).fetchone()
+            if row is None:
+                return None
+            artifacts = self._conn.execute(
+                'SELECT name, kind, path, size_bytes, created_at FROM artifacts WHERE workspace = ? ORDER BY name',
+                (workspace,)).fetchall()
+        document = dict(row)
+        document['artifacts'] = [dict(artifact) for artifact in artifacts]
+        return document
+
+    def latest_document(self):
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT workspace FROM documents ORDER BY updated_at DESC LIMIT 1').fetchone()
+        return self.get_document(row['workspace']) if row else None
+
+    def list_documents(self, limit=50, offset=0):
+        # Most recently processed first
+        with self._lock:
+            rows = self._conn.execute(
+                '''SELECT d.*, COUNT(a.name) AS artifact_count
+                   FROM documents d LEFT JOIN artifacts a ON a.workspace = d.workspace
+                   GROUP BY d.workspace ORDER BY d.updated_at DESC LIMIT ? OFFSET ?''',
+                (limit, offset)).fetchall()
+            total = self._conn.execute('SELECT COUNT(*) FROM documents').fetchone()[0]
+        return [dict(row) for row in rows], total
+
+    def find_artifact(self, name, workspace=None):
+        # Newest artifact with this file name, optionally within one workspace
+        query = 'SELECT * FROM artifacts WHERE name = ?'
+        params = [name]
+        if workspace is not None:
+            query += ' AND workspace = ?'
+            params.append(workspace)
+        query += ' ORDER BY created_at DESC LIMIT 1'
+        with self._lock:
+            row = self._conn.execute(query, params).fetchone()
+        return dict(row) if row else None
+
+    def find_artifacts(self, name):
+        # Every workspace's artifact with this file name, newest first
+        with self._lock:
+            rows = self._conn.execute('SELECT * FROM artifacts WHERE name = ? ORDER BY created_at DESC',
+                                      (name,)).fetchall()
+        return [dict(row) for row in rows]
+
+    def content_hash(self, path, workspace=None):
+        # sha256 of the file at `path`, from the index while the file is unchanged since
+        # it was recorded; otherwise hashed now (and stored, if the file is indexed)
+        name = os.path.basename(path)
+        artifact = self.find_artifact(name, workspace)
+        mtime = os.path.getmtime(path)
+        if (artifact is not None and artifact['path'] == path and artifact['sha256']
+                and artifact['mtime'] == mtime and artifact['size_bytes'] == os.path.getsize(path)):
+            return artifact['sha256']
+        sha256 = file_sha256(path)
+        if artifact is not None and artifact['path'] == path:
+            with self._lock, self._conn:
+                self._conn.execute(
+                    'UPDATE artifacts SET sha256 = ?, mtime = ?, size_bytes = ? WHERE workspace = ? AND name = ?',
+                    (sha256, mtime, os.path.getsize(path), artifact['workspace'], name))
+        return sha256
+
+    def forget_artifact(self, workspace, name):
+        # Drop an entry whose file was removed outside the app
+        with self._lock, self._conn:
+            self._conn.execute('DELETE FROM artifacts WHERE workspace = ? AND name = ?', (workspace, name))
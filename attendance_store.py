@@ -0,0 +1,243 @@
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+# SQLite file holding every parsed sheet in long form, one row per student/subject/type
+ATTENDANCE_STORE_PATH = 'attendance.db'
+# Cap on rows returned by a single query endpoint call
+QUERY_ROW_LIMIT = 5000
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS sheets (
+    workspace TEXT PRIMARY KEY,
+    filename TEXT NOT NULL,
+    file_hash TEXT NOT NULL,
+    department TEXT,
+    session TEXT,
+    semester TEXT,
+    year TEXT,
+    section TEXT,
+    sheet_date TEXT,
+    students INTEGER NOT NULL,
+    stored_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS attendance (
+    workspace TEXT NOT NULL REFERENCES sheets (workspace),
+    enrollment TEXT NOT NULL,
+    name TEXT,
+    subject TEXT NOT NULL,
+    type TEXT NOT NULL,
+    total REAL,
+    attended REAL,
+    percentage REAL
+);
+CREATE INDEX IF NOT EXISTS attendance_enrollment ON attendance (enrollment);
+CREATE INDEX IF NOT EXISTS attendance_subject ON attendance (subject, type, percentage);
+CREATE INDEX IF NOT EXISTS attendance_workspace ON attendance (workspace);
+CREATE INDEX IF NOT EXISTS sheets_section ON sheets (section, year, session, sheet_date);
+CREATE TABLE IF NOT EXISTS snapshot_changes (
+    workspace TEXT NOT NULL REFERENCES sheets (workspace),
+    previous_workspace TEXT NOT NULL REFERENCES sheets (workspace),
+    enrollment TEXT NOT NULL,
+    name TEXT,
+    subject TEXT NOT NULL,
+    type TEXT NOT NULL,
+    change TEXT NOT NULL,
+    previous_total REAL,
+    previous_attended REAL,
+    previous_percentage REAL,
+    total REAL,
+    attended REAL,
+    percentage REAL
+);
+CREATE INDEX IF NOT EXISTS snapshot_changes_workspace ON snapshot_changes (workspace, change);
+'''
+
+# Title rows look like "DEPARTMENT OF COMPUTER ENGINEERING", "SESSION : July-December 2024;
+# Semester "A"" and either "III YEAR ATTENDANCE SHEET SECTION A(till 31/08/2024 )" or
+# "BTech. II YEAR ATTENDANCE SHEET(till 29/02/2024)" with a separate "SECTION: A" row
+DEPARTMENT_PATTERN = re.compile(r'DEPARTMENT\s+OF\s+([^|;,(]+)', re.IGNORECASE)
+SESSION_PATTERN = re.compile(r'SESSION\s*:\s*([^;|]+)', re.IGNORECASE)
+SEMESTER_PATTERN = re.compile(r'SEMESTER\s*"?\s*([A-Z0-9]+)', re.IGNORECASE)
+YEAR_PATTERN = re.compile(r'\b(IV|I{1,3}|[1-4])(?:ST|ND|RD|TH)?\s+YEAR\b', re.IGNORECASE)
+SECTION_PATTERN = re.compile(r'\bSECTION\s*:?\s*([A-Z0-9]+)', re.IGNORECASE)
+DATE_PATTERN = re.compile(r'till\s+(\d{1,2}/\d{1,2}/\d{4})', re.IGNORECASE)
+YEAR_NUMERALS = {'1': 'I', '2': 'II', '3': 'III', '4': 'IV'}
+# Title fields that tell apart sheets of different classes: snapshots are only compared
+# when all of them agree
+CLASS_FIELDS = ('department', 'session', 'semester', 'year', 'section')
+
+
+def sheet_metadata(preamble):
+    # Department, session, semester, year, section and "attendance till" date from the
+    # title rows, when present
+    text = ' | '.join(' '.join(str(value) for value in row if value) for row in (preamble or []))
+
+    def field(pattern):
+        match = pattern.search(text)
+        return ' '.join(match.group(1).split()).upper() if match else None
+
+    year = field(YEAR_PATTERN)
+    date = DATE_PATTERN.search(text)
+    sheet_date = None
+    if date:
+        try:
+            sheet_date = datetime.strptime(date.group(1), '%d/%m/%Y').date().isoformat()
+        except ValueError:
+            pass
+    session = SESSION_PATTERN.search(text)
+    return {'department': field(DEPARTMENT_PATTERN),
+            'session': ' '.join(session.group(1).split()) if session else None,
+            'semester': field(SEMESTER_PATTERN),
+            'year': YEAR_NUMERALS.get(year, year),
+            'section': field(SECTION_PATTERN),
+            'sheet_date': sheet_date}
+
+
+def attendance_records(df, schema=None):
+    # Long-form frame (enrollment, name, subject, type, total, attended, percentage),
+    # which the compact table already holds; df may be the parsed DataFrame or its CompactTable
+    from compact_table import as_compact
+
+    return as_compact(df, schema).records()
+
+
+def _sql_value(value):
+    # NaN becomes NULL and numpy scalars become plain Python numbers for sqlite3
+    if value is None or value != value:
+        return None
+    return value.item() if hasattr(value, 'item') else value
+
+
+class AttendanceStore:
+    # Every parsed sheet is kept here so questions across uploads are answered with
+    # indexed queries instead of re-extracting the original PDFs
+    def __init__(self, path=ATTENDANCE_STORE_PATH):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            if path != ':memory:':
+                self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.executescript(SCHEMA)
+
+    def has_sheet(self, workspace):
+        with self._lock:
+            row = self._conn.execute('SELECT 1 FROM sheets WHERE workspace = ?', (workspace,)).fetchone()
+        return row is not None
+
+    def store_sheet(self, workspace, filename, file_hash, df, schema=None, preamble=None):
+        # Workspaces are content addressed, so a stored workspace never needs rewriting
+        if self.has_sheet(workspace):
+            return False
+        records = attendance_records(df, schema)
+        meta = sheet_metadata(preamble)
+        rows = [(workspace,) + tuple(_sql_value(value) for value in record)
+                for record in records.itertuples(index=False, name=None)]
+        with self._lock, self._conn:
+            self._conn.execute(
+                '''INSERT OR IGNORE INTO sheets (workspace, filename, file_hash, department, session, semester,
+                                                 year, section, sheet_date, students, stored_at)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+                (workspace, filename, file_hash, meta['department'], meta['session'], meta['semester'],
+                 meta['year'], meta['section'], meta['sheet_date'], int(records['enrollment'].nunique()),
+                 time.time()))
+            self._conn.execute('DELETE FROM attendance WHERE workspace = ?', (workspace,))
+            self._conn.executemany(
+                '''INSERT INTO attendance (workspace, enrollment, name, subject, type, total, attended, percentage)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?)''', rows)
+        return True
+
+    def get_sheet(self, workspace):
+        with self._lock:
+            row = self._conn.execute('SELECT * FROM sheets WHERE workspace = ?', (workspace,)).fetchone()
+        return dict(row) if row else None
+
+    def previous_snapshot(self, workspace):
+        # The latest earlier snapshot of the same class: department, session, semester,
+        # year and section all agree (missing fields must be missing on both), if any
+        sheet = self.get_sheet(workspace)
+        if sheet is None or sheet['section'] is None:
+            return None
+        query = ('SELECT * FROM sheets WHERE ' + ' AND '.join(f'{field} IS ?' for field in CLASS_FIELDS)
+                 + ' AND workspace != ?')
+        params = [sheet[field] for field in CLASS_FIELDS] + [workspace]
+        if sheet['sheet_date'] is not None:
+            query += ' AND (sheet_date IS NULL OR sheet_date < ?)'
+            params.append(sheet['sheet_date'])
+        query += ' ORDER BY sheet_date DESC, stored_at DESC LIMIT 1'
+        with self._lock:
+            row = self._conn.execute(query, params).fetchone()
+        return dict(row) if row else None
+
+    def records(self, workspace):
+        # The long-form rows of one stored sheet, as attendance_records returned them
+        import pandas as pd
+
+        with self._lock:
+            rows = self._conn.execute(
+                '''SELECT enrollment, name, subject, type, total, attended, percentage
+                   FROM attendance WHERE workspace = ?''', (workspace,)).fetchall()
+        return pd.DataFrame([tuple(row) for row in rows],
+                            columns=['enrollment', 'name', 'subject', 'type', 'total', 'attended', 'percentage'])
+
+    def store_changes(self, workspace, previous_workspace, changes):
+        # Only the rows that differ from the previous snapshot (see snapshot_diff)
+        columns = ', '.join(changes.columns)
+        placeholders = ', '.join('?' * (len(changes.columns) + 2))
+        rows = [(workspace, previous_workspace) + tuple(_sql_value(value) for value in record)
+                for record in changes.itertuples(index=False, name=None)]
+        with self._lock, self._conn:
+            self._conn.execute('DELETE FROM snapshot_changes WHERE workspace = ?', (workspace,))
+            self._conn.executemany(
+                f'INSERT INTO snapshot_changes (workspace, previous_workspace, {columns}) VALUES ({placeholders})',
+                rows)
+
+    def changes(self, workspace, change=None, limit=QUERY_ROW_LIMIT):
+        query = 'SELECT * FROM snapshot_changes WHERE workspace = ?'
+        params = [workspace]
+        if change:
+            query += ' AND change = ?'
+            params.append(change)
+        query += ' ORDER BY enrollment, subject, type LIMIT ?'
+        with self._lock:
+            rows = self._conn.execute(query, params + [limit]).fetchall()
+        return [dict(row) for row in rows]
+
+    def list_sheets(self):
+        with self._lock:
+            rows = self._conn.execute('SELECT * FROM sheets ORDER BY stored_at DESC').fetchall()
+        return [dict(row) for row in rows]
+
+    def query(self, enrollment=None, subject=None, attendance_type=None, section=None,
+              below=None, limit=QUERY_ROW_LIMIT):
+        # Records matching every given filter, joined with the sheet they came from
+        clauses, params = [], []
+        if enrollment:
+            clauses.append('a.enrollment = ?')
+            params.append(enrollment.strip().upper())
+        if subject:
+            clauses.append('a.subject = ?')
+            params.append(subject.strip().upper())
+        if attendance_type:
+            clauses.append('a.type = ?')
+            params.append(attendance_type.strip().upper())
+        if section:
+            clauses.append('s.section = ?')
+            params.append(section.strip().upper())
+        if below is not None:
+            clauses.append('a.percentage < ?')
+            params.append(below)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        sql = f'''SELECT a.enrollment, a.name, a.subject, a.type, a.total, a.attended, a.percentage,
+                         s.section, s.session, s.sheet_date, a.workspace
+                  FROM attendance a JOIN sheets s ON s.workspace = a.workspace
+                  {where}
+                  ORDER BY a.enrollment, a.subject, a.type, s.sheet_date
+                  LIMIT ?'''
+        with self._lock:
+            rows = self._conn.execute(sql, params + [limit]).fetchall()
+        return [dict(row) for row in rows]
@@ -0,0 +1,99 @@
+import csv
+from collections import Counter
+from itertools import islice
+
+import pandas as pd
+
+# Institute title, session, sheet title, note and a spacer row sit above the subject header
+HEADER_SKIP_ROWS = 5
+
+
+class EmptyTableError(ValueError):
+    # No rows past the title block, so there is no subject header to read
+    pass
+
+
+def load_attendance_table(csv_path):
+    # Skip the institute title block; the subject header row becomes the columns
+    return pd.read_csv(csv_path, skiprows=HEADER_SKIP_ROWS)
+
+
+def read_preamble(csv_path, skip_rows=HEADER_SKIP_ROWS):
+    # The title rows load_attendance_table skips (session, section, date)
+    with open(csv_path, newline='') as csv_file:
+        return list(islice(csv.reader(csv_file), skip_rows))
+
+
+def iter_workbook_rows(path):
+    # Rows of the first sheet of an Excel upload, streamed once by openpyxl in read-only
+    # mode for table_from_rows (blank cells as '', trailing blank rows dropped, like
+    # read_excel did). Legacy .xls files, which openpyxl cannot open, go through read_excel.
+    if path.lower().endswith('.xls'):
+        sheet = pd.read_excel(path, header=None, dtype=object)
+        yield from ([('' if value is None or value != value else value) for value in row]
+                    for row in sheet.itertuples(index=False, name=None))
+        return
+
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        sheet = workbook.worksheets[0]
+        # Some writers store a wrong sheet size, which would cut rows short in read-only mode
+        sheet.reset_dimensions()
+        blank_rows = 0
+        for row in sheet.iter_rows(values_only=True):
+            row = ['' if value is None else value for value in row]
+            if not any(value != '' for value in row):
+                blank_rows += 1
+                continue
+            # Blank rows inside the sheet are kept, only trailing ones are dropped
+            yield from ([] for _ in range(blank_rows))
+            blank_rows = 0
+            yield row
+    finally:
+        workbook.close()
+
+
+def header_names(header):
+    # Column names the way read_csv names them: blanks become "Unnamed: N" and
+    # repeated names get a ".1", ".2", ... suffix
+    names, seen = [], Counter()
+    for i, value in enumerate(header):
+        if value in (None, ''):
+            names.append(f'Unnamed: {i}')
+            continue
+        names.append(f'{value}.{seen[value]}' if seen[value] else value)
+        seen[value] += 1
+    return names
+
+
+def table_from_rows(rows, skip_rows=HEADER_SKIP_ROWS):
+    # Build the analysis table straight from extracted rows (any iterable, typically
+    # a generator fed by extraction), matching what load_attendance_table returns for
+    # the same rows written as CSV. Returns the table and the skipped title rows
+    # (session, section, date).
+    rows = iter(rows)
+    preamble = list(islice(rows, skip_rows))
+    header = next(rows, None)
+    if header is None:
+        raise EmptyTableError("CSV file is empty or could not be read.")
+
+    body = [[None if value == '' else value for value in row] for row in rows]
+    width = max([len(header)] + [len(row) for row in body])
+    columns = header_names(list(header) + [None] * (width - len(header)))
+    body = [row + [None] * (width - len(row)) for row in body]
+
+    df = pd.DataFrame(body, columns=columns, dtype=object)
+    for col in df.columns:
+        # Same inference as read_csv: a column becomes numeric only if every value parses
+        values = df[col]
+        numbers = pd.to_numeric(values, errors='coerce')
+        if numbers.notna().sum() == values.notna().sum():
+            if numbers.notna().all() and (numbers % 1 == 0).all():
+                numbers = numbers.astype('int64')
+            df[col] = numbers
+        else:
+            df[col] = values.astype('str').where(values.notna())
+    return df, preamble
+
@@ -0,0 +1,109 @@
+import logging
+import os
+
+import pandas as pd
+
+from compact_table import as_compact
+from excel_writer import refresh_sheet_values, write_highlighted_sheets, write_sheet
+from highlight_rules import load_rules, rules_for
+from metrics import timed_span
+from schema import TOTAL
+from workspace import atomic_write
+
+logger = logging.getLogger(__name__)
+
+BATCH_REPORT_NAME = 'ALL_SUBJECTS_highlighted_attendance.xlsx'
+MERGED_REPORT_NAME = 'ALL_SECTIONS_highlighted_attendance.xlsx'
+REPORT_COLUMNS = ['Total', 'Attended', 'Percentage']
+
+
+def build_report_frames(df, schema=None):
+    # One small frame per subject/type plus TOTAL, all sliced from the same compact table
+    # (df may be the parsed DataFrame or its CompactTable), as (sheet_name, frame,
+    # subject, type) entries
+    table = as_compact(df, schema)
+    table.schema.lookup(TOTAL)  # A sheet without its TOTAL block has no reports
+    ids = table.students()
+
+    frames = []
+    for subject, kind in table.blocks:
+        counts = table.block(subject, kind, plain=True).set_axis(REPORT_COLUMNS, axis=1)
+        kind = None if subject == TOTAL else kind
+        sheet_name = f'{subject} {kind}' if kind else subject
+        frames.append((sheet_name[:31], pd.concat([ids, counts], axis=1), subject, kind))
+    return frames
+
+
+def write_batch_report(df, excel_folder, schema=None, low_memory=None, rules=None):
+    # Every subject/type sheet plus TOTAL in one workbook, written in one pass, each
+    # sheet highlighted with the rules that apply to its subject and type
+    frames = build_report_frames(df, schema)
+    if len(frames) == 1:
+        raise ValueError("No subject columns found in the sheet header.")
+
+    rules = rules if rules is not None else load_rules()
+    output_excel = os.path.join(excel_folder, BATCH_REPORT_NAME)
+    sheets = [(name, frame, ['Percentage'], rules_for(rules, subject, kind)) for name, frame, subject, kind in frames]
+    highlighted = write_highlighted_sheets(sheets, output_excel, low_memory=low_memory)
+    logger.info("Written %d sheets with %d highlighted cells to %s", len(sheets), highlighted, output_excel)
+    return output_excel, [name for name, _, _, _ in frames]
+
+
+def update_batch_report(df, previous_excel, excel_folder, affected, schema=None, rules=None):
+    # The ALL_SUBJECTS workbook of this snapshot, from the previous snapshot's: sheets of
+    # the affected (subject, type) blocks (TOTAL as (TOTAL, TOTAL)) are written again,
+    # highlights included; every other sheet keeps its rows and conditional formats and
+    # only gets this snapshot's counts. Returns the workbook and the sheets rewritten.
+    from openpyxl import load_workbook
+
+    frames = build_report_frames(df, schema)
+    rules = rules if rules is not None else load_rules()
+    with timed_span('workbook_load'):
+        wb = load_workbook(previous_excel)
+    if [ws.title for ws in wb.worksheets] != [name for name, _, _, _ in frames]:
+        # Subjects came or went, nothing to keep
+        output_excel, sheets = write_batch_report(df, excel_folder, schema, rules=rules)
+        return output_excel, sheets
+
+    affected = set(affected)
+    rewritten = []
+    for name, frame, subject, kind in frames:
+        ws = wb[name]
+        if (subject, kind or TOTAL) not in affected and refresh_sheet_values(ws, frame, REPORT_COLUMNS,
+                                                                            frame.columns[1]):
+            continue
+        index = wb.index(ws)
+        wb.remove(ws)
+        write_sheet(wb.create_sheet(name, index), frame, ['Percentage'], rules_for(rules, subject, kind))
+        rewritten.append(name)
+
+    output_excel = os.path.join(excel_folder, BATCH_REPORT_NAME)
+    with timed_span('workbook_save'), atomic_write(output_excel) as tmp_path:
+        wb.save(tmp_path)
+    logger.info("Rewrote %d of %d sheets in %s", len(rewritten), len(frames), output_excel)
+    return output_excel, rewritten
+
+
+def write_merged_report(tables, excel_folder, low_memory=None, rules=None):
+    # One workbook for several parsed sheets (e.g. every section of a year). Each
+    # subject/type sheet stacks the students of every table that has that block,
+    # with a leading Source column naming the table they came from.
+    rules = rules if rules is not None else load_rules()
+    merged = {}  # sheet name -> (subject, type, frames), in first-seen order
+    for label, df, schema in tables:
+        for name, frame, subject, kind in build_report_frames(df, schema):
+            merged.setdefault(name, (subject, kind, []))[2].append(frame.assign(Source=label))
+    if not merged:
+        raise ValueError("No sheets to merge.")
+
+    sheets = []
+    for name, (subject, kind, frames) in merged.items():
+        frame = pd.concat(frames, ignore_index=True)
+        frame = frame[['Source'] + [col for col in frame.columns if col != 'Source']]
+        sheets.append((name, frame, ['Percentage'], rules_for(rules, subject, kind)))
+
+    output_excel = os.path.join(excel_folder, MERGED_REPORT_NAME)
+    highlighted = write_highlighted_sheets(sheets, output_excel, low_memory=low_memory)
+    logger.info("Merged %d tables into %d sheets with %d highlighted cells in %s",
+                len(tables), len(sheets), highlighted, output_excel)
+    return output_excel, [name for name, _, _, _ in sheets]
@@ -0,0 +1,321 @@
+import argparse
+import csv
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import pandas as pd
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, REPO_DIR)
+
+from attendance_table import iter_workbook_rows, load_attendance_table, table_from_rows
+from compact_table import CompactTable
+from defaulters import find_defaulters
+from excel_writer import below_threshold_mask, write_highlighted_workbook
+from pdf_extract import PDF_EXTRACT_WORKERS, classify_pages, count_pages, extract_table_rows
+from schema import SheetSchema
+from subject_reports import SUBJECT_REPORT_WORKERS, write_subject_reports
+from synthetic_sheets import synthetic_rows, write_synthetic_pdf, write_synthetic_xlsx
+
+SAMPLE_FILES = ['uploads/input.pdf', 'uploads/input1.pdf', 'uploads/2.pdf', 'uploads/att.pdf']
+# students x subjects for the generated sheets used to show scaling
+SYNTHETIC_SIZES = ['1000x12', '4000x36']
+# A stage is flagged by --compare when it got this much slower
+REGRESSION_RATIO = 1.10
+
+
+def timed(func, repeat):
+    # Median wall time over `repeat` runs, plus the result of the last run
+    times, result = [], None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times), result
+
+
+def ocr_available():
+    return shutil.which('tesseract') is not None and shutil.which('pdftoppm') is not None
+
+
+def run_stage(results, name, func, repeat):
+    # Record the stage time, or the error when a sample does not fit the pipeline
+    try:
+        seconds, value = timed(func, repeat)
+        results[name] = round(seconds, 6)
+        return value
+    except Exception as e:
+        results[name] = {'error': f'{type(e).__name__}: {e}'}
+        return None
+
+
+def bench_table_stages(stages, rows, work_dir, repeat):
+    # Everything downstream of extraction, shared by PDF and XLSX inputs. Returns the
+    # bytes held by the parsed table and by its compact form.
+    csv_path = os.path.join(work_dir, 'data.csv')
+    with open(csv_path, 'w', newline='') as csv_file:
+        csv.writer(csv_file).writerows(rows)
+
+    run_stage(stages, 'csv_load', lambda: load_attendance_table(csv_path), repeat)
+    table = run_stage(stages, 'table_from_rows', lambda: table_from_rows(rows), repeat)
+    if table is None:
+        return
+    df = table[0]
+
+    schema = run_stage(stages, 'schema_build', lambda: SheetSchema.from_table(df), repeat)
+    if schema is None:
+        return
+    percentage_col = df.columns[schema.lookup('TOTAL')[2]]
+    run_stage(stages, 'highlight_mask', lambda: below_threshold_mask(df[percentage_col]), repeat)
+    compact = run_stage(stages, 'compact_table', lambda: CompactTable.from_table(df, schema), repeat)
+    if compact is None:
+        return None
+    run_stage(stages, 'defaulters', lambda: find_defaulters(compact, 'TOTAL', schema=schema), repeat)
+
+    output_excel = os.path.join(work_dir, 'bench.xlsx')
+    run_stage(stages, 'excel_save', lambda: write_highlighted_workbook(df, output_excel, [percentage_col],
+                                                                       low_memory=False), repeat)
+    run_stage(stages, 'excel_save_low_memory', lambda: write_highlighted_workbook(
+        df, output_excel, [percentage_col], low_memory=True), repeat)
+
+    # Per-subject PDF + XLSX reports, one worker against the pool
+    reports_dir = os.path.join(work_dir, 'subject_reports')
+    os.makedirs(reports_dir, exist_ok=True)
+    run_stage(stages, 'subject_reports_serial', lambda: write_subject_reports(
+        compact, reports_dir, reports_dir, schema, workers=1), repeat)
+    run_stage(stages, 'subject_reports_parallel', lambda: write_subject_reports(
+        compact, reports_dir, reports_dir, schema, workers=max(SUBJECT_REPORT_WORKERS, 2), min_rows=0), repeat)
+    return compact.footprint(df)
+
+
+STARTUP_SCRIPT = '''
+import json, sys, time
+start = time.perf_counter()
+import sub
+imported = time.perf_counter()
+app = sub.create_app(preload="")
+created = time.perf_counter()
+app.test_client().get("/cache/stats")
+first_request = time.perf_counter()
+warm_up = sub.warm_up("core")
+warmed = time.perf_counter()
+print(json.dumps({"import_sub": imported - start, "create_app": created - imported,
+                  "first_light_request": first_request - created, "warm_up_core": warmed - first_request,
+                  "warm_up_modules": warm_up}))
+'''
+
+
+def bench_startup(work_dir, repeat):
+    # Cold start of a worker in a fresh interpreter: importing sub, building the app,
+    # serving a request that needs no heavy libraries, then warm_up() of the rest
+    runs = []
+    for _ in range(repeat):
+        output = subprocess.check_output([sys.executable, '-c', STARTUP_SCRIPT], cwd=work_dir, text=True,
+                                         env=dict(os.environ, PYTHONPATH=REPO_DIR, LOG_LEVEL='WARNING'))
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+    result = {key: round(statistics.median(run[key] for run in runs), 6) for key in runs[0] if key != 'warm_up_modules'}
+    result['warm_up_modules'] = runs[-1]['warm_up_modules']
+    return result
+
+
+MEMORY_SCRIPT = '''
+import json, sys
+from memory_guard import peak_rss_bytes
+from pdf_extract import extract_table_rows
+baseline = peak_rss_bytes()
+rows = extract_table_rows(sys.argv[1], workers=1)
+print(json.dumps({"rows": len(rows), "baseline_rss_mb": baseline / 2 ** 20, "peak_rss_mb": peak_rss_bytes() / 2 ** 20}))
+'''
+
+
+def bench_extract_memory(path, work_dir):
+    # Peak RSS of a serial extraction in a fresh interpreter, so earlier stages do not
+    # inflate it. With pages released as they are read this stays flat as documents grow.
+    output = subprocess.check_output([sys.executable, '-c', MEMORY_SCRIPT, path], cwd=work_dir, text=True,
+                                     env=dict(os.environ, PYTHONPATH=REPO_DIR, LOG_LEVEL='WARNING'))
+    run = json.loads(output.strip().splitlines()[-1])
+    return {key: round(value, 1) for key, value in run.items() if key != 'rows'}
+
+
+def bench_upload(stages, client, sub, path, repeat):
+    # End-to-end POST /upload through Flask's test client, cold (cache cleared) and warm
+    with open(path, 'rb') as upload:
+        data = upload.read()
+    name = os.path.basename(path)
+
+    def post():
+        response = client.post('/upload', data={'file': (io.BytesIO(data), name), 'subject': 'TOTAL'})
+        if response.status_code != 200:
+            raise RuntimeError(response.get_json().get('error'))
+
+    def cold():
+        sub.table_cache.clear()
+        post()
+
+    run_stage(stages, 'upload_end_to_end', cold, repeat)
+    run_stage(stages, 'upload_end_to_end_cached', post, repeat)
+
+
+def bench_document(path, work_dir, client, sub, repeat):
+    stages = {}
+    result = {'path': os.path.relpath(path, REPO_DIR) if path.startswith(REPO_DIR) else path,
+              'bytes': os.path.getsize(path), 'stages': stages}
+
+    if path.endswith('.pdf'):
+        result['pages'] = count_pages(path)
+        result['memory'] = bench_extract_memory(path, work_dir)
+        run_stage(stages, 'classify_pages', lambda: classify_pages(path), repeat)
+        rows = run_stage(stages, 'pdf_extract_serial', lambda: extract_table_rows(path, workers=1), repeat)
+        run_stage(stages, 'pdf_extract_parallel', lambda: extract_table_rows(
+            path, workers=max(PDF_EXTRACT_WORKERS, 2), min_pages=2), repeat)
+        if ocr_available():
+            from ocr import ocr_page_rows
+            run_stage(stages, 'ocr_first_page', lambda: ocr_page_rows(path, 1), repeat)
+        else:
+            stages['ocr_first_page'] = {'skipped': 'tesseract/poppler not installed'}
+    else:
+        def read_xlsx_rows():
+            # The current XLSX path: read_excel, then to_csv, then back through read_csv
+            csv_path = os.path.join(work_dir, 'xlsx.csv')
+            pd.read_excel(path).to_csv(csv_path, index=False)
+            with open(csv_path, newline='') as csv_file:
+                return list(csv.reader(csv_file))
+        rows = run_stage(stages, 'xlsx_read', read_xlsx_rows, repeat)
+
+        def xlsx_csv_round_trip():
+            # The same, through to the parsed table
+            csv_path = os.path.join(work_dir, 'xlsx.csv')
+            pd.read_excel(path).to_csv(csv_path, index=False)
+            return load_attendance_table(csv_path)
+        run_stage(stages, 'xlsx_csv_round_trip', xlsx_csv_round_trip, repeat)
+        # What uploads use: one read-only pass over the workbook into the table
+        run_stage(stages, 'xlsx_stream_table', lambda: table_from_rows(iter_workbook_rows(path)), repeat)
+
+    if rows:
+        result['rows'] = len(rows)
+        result['table_memory'] = bench_table_stages(stages, rows, work_dir, repeat)
+    if client is not None:
+        bench_upload(stages, client, sub, path, repeat)
+    return result
+
+
+def make_synthetic(size, work_dir):
+    students, subjects = (int(part) for part in size.lower().split('x'))
+    rows = synthetic_rows(students, subjects)
+    pdf_path = write_synthetic_pdf(os.path.join(work_dir, f'synthetic_{size}.pdf'), rows)
+    xlsx_path = write_synthetic_xlsx(os.path.join(work_dir, f'synthetic_{size}.xlsx'), rows)
+    return [pdf_path, xlsx_path]
+
+
+def make_synthetic_workbook(size, work_dir):
+    # XLSX only, for workbooks too large to be worth rendering as a PDF
+    students, subjects = (int(part) for part in size.lower().split('x'))
+    return write_synthetic_xlsx(os.path.join(work_dir, f'synthetic_{size}.xlsx'), synthetic_rows(students, subjects))
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=REPO_DIR, text=True).strip()
+    except Exception:
+        return None
+
+
+def compare(current, previous_path):
+    with open(previous_path) as previous_file:
+        previous = json.load(previous_file)
+    print(f"\nComparison with {previous_path} (ratio = now / before):")
+    for stage, seconds in current.get('startup', {}).items():
+        old = previous.get('startup', {}).get(stage)
+        if isinstance(seconds, float) and isinstance(old, float) and old:
+            flag = '  <-- slower' if seconds / old > REGRESSION_RATIO else ''
+            print(f"  {'startup':28} {stage:28} {old:9.4f}s -> {seconds:9.4f}s  x{seconds / old:.2f}{flag}")
+    for name, doc in current['documents'].items():
+        before = previous.get('documents', {}).get(name, {}).get('stages', {})
+        for stage, seconds in doc['stages'].items():
+            old = before.get(stage)
+            if not isinstance(seconds, float) or not isinstance(old, float) or old == 0:
+                continue
+            ratio = seconds / old
+            flag = '  <-- slower' if ratio > REGRESSION_RATIO else ''
+            print(f"  {name:28} {stage:28} {old:9.4f}s -> {seconds:9.4f}s  x{ratio:.2f}{flag}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time each stage of the attendance pipeline.')
+    parser.add_argument('--output', default='benchmark_results.json', help='Where to write the JSON results')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per stage; the median is recorded')
+    parser.add_argument('--files', nargs='*', default=SAMPLE_FILES, help='Sample documents to time')
+    parser.add_argument('--synthetic', nargs='*', default=SYNTHETIC_SIZES,
+                        help='Generated sheet sizes as STUDENTSxSUBJECTS, e.g. 4000x36')
+    parser.add_argument('--workbooks', nargs='*', default=[],
+                        help='Generated XLSX-only sizes for large workbooks, e.g. 20000x36')
+    parser.add_argument('--no-upload', action='store_true', help='Skip the end-to-end /upload stage')
+    parser.add_argument('--compare', help='Previous results file to compare against')
+    args = parser.parse_args()
+
+    output = os.path.abspath(args.output)
+    files = [os.path.join(REPO_DIR, path) for path in args.files]
+    work_dir = tempfile.mkdtemp(prefix='attendance-bench-')
+
+    try:
+        for size in args.synthetic:
+            files.extend(make_synthetic(size, work_dir))
+        for size in args.workbooks:
+            files.append(make_synthetic_workbook(size, work_dir))
+
+        client = sub = None
+        if not args.no_upload:
+            # The app writes uploads/, csv/ and excel/ relative to the working directory,
+            # so run it inside the scratch folder to leave the repository untouched
+            os.chdir(work_dir)
+            import sub
+            client = sub.create_app().test_client()
+
+        results = {
+            'created': datetime.now(timezone.utc).isoformat(),
+            'git_commit': git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'repeat': args.repeat,
+            'documents': {},
+        }
+        print("Benchmarking worker startup ...")
+        results['startup'] = bench_startup(work_dir, args.repeat)
+        for stage, seconds in results['startup'].items():
+            if stage != 'warm_up_modules':
+                print(f"  {stage:28} {seconds:.4f}s")
+        for path in files:
+            name = os.path.basename(path)
+            print(f"Benchmarking {name} ...")
+            results['documents'][name] = bench_document(path, work_dir, client, sub, args.repeat)
+            for stage, seconds in results['documents'][name]['stages'].items():
+                print(f"  {stage:28} {seconds if not isinstance(seconds, float) else f'{seconds:.4f}s'}")
+            if 'memory' in results['documents'][name]:
+                print(f"  {'pdf_extract_peak_rss':28} {results['documents'][name]['memory']['peak_rss_mb']:.1f} MB")
+            if results['documents'][name].get('table_memory'):
+                footprint = results['documents'][name]['table_memory']
+                print(f"  {'table_bytes':28} {footprint['raw_bytes']} raw, {footprint['compact_bytes']} compact")
+    finally:
+        os.chdir(REPO_DIR)
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    with open(output, 'w') as output_file:
+        json.dump(results, output_file, indent=2)
+    print(f"Wrote benchmark results to {output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+import io
+import os
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.utils import secure_filename
+
+# Files handled concurrently by one bulk request; their PDF pages share one extraction
+# process pool
+BULK_WORKERS = max(2, min(4, os.cpu_count() or 1))
+BULK_MAX_FILES = 50
+# Total uncompressed size accepted from one request, so a ZIP cannot expand without bound
+BULK_MAX_BYTES = 200 * 1024 * 1024
+SHEET_EXTENSIONS = ('.pdf', '.xlsx', '.xls')
+
+
+def expand_uploads(files):
+    # (filename, source, bytes) for every sheet in the request. ZIP archives are opened
+    # and their PDF/XLSX members taken, folders and macOS metadata skipped. source is the
+    # member's path inside the archive (the file name for plain uploads), so sheets with
+    # the same name in different folders stay apart.
+    entries, total = [], 0
+    for file in files:
+        data = file.read()
+        filename = secure_filename(file.filename or '')
+        if filename.lower().endswith('.zip'):
+            try:
+                archive = zipfile.ZipFile(io.BytesIO(data))
+            except zipfile.BadZipFile:
+                raise ValueError(f"{filename} is not a valid ZIP archive.")
+            members = [(info, secure_filename(os.path.basename(info.filename))) for info in archive.infolist()
+                       if not info.is_dir() and not info.filename.startswith('__MACOSX/')]
+            for info, name in members:
+                if name.startswith('.') or not name.lower().endswith(SHEET_EXTENSIONS):
+                    continue
+                total += info.file_size
+                if total > BULK_MAX_BYTES:
+                    raise ValueError(f"Uploads exceed {BULK_MAX_BYTES // (1024 * 1024)} MB uncompressed.")
+                # Each folder name made safe on its own, so the path still reads as one
+                source = '/'.join(filter(None, (secure_filename(part) for part in info.filename.split('/'))))
+                entries.append((name, source, archive.read(info)))
+        elif filename.lower().endswith(SHEET_EXTENSIONS):
+            total += len(data)
+            if total > BULK_MAX_BYTES:
+                raise ValueError(f"Uploads exceed {BULK_MAX_BYTES // (1024 * 1024)} MB uncompressed.")
+            entries.append((filename, filename, data))
+        else:
+            raise ValueError(f"Unsupported file format: {filename or 'unnamed file'}")
+
+    if not entries:
+        raise ValueError('No PDF or Excel sheets found in the upload.')
+    if len(entries) > BULK_MAX_FILES:
+        raise ValueError(f"At most {BULK_MAX_FILES} sheets can be processed in one request.")
+    return entries
+
+
+def run_concurrently(func, items, workers=BULK_WORKERS):
+    # func(item) for every item on a thread pool, returning (result, error) pairs in
+    # input order, so one bad sheet does not fail the others
+    def guarded(item):
+        try:
+            return func(item), None
+        except Exception as e:
+            return None, e
+
+    with ThreadPoolExecutor(max_workers=min(workers, len(items)) or 1) as pool:
+        return list(pool.map(guarded, items))
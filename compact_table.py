@@ -0,0 +1,181 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+from schema import SheetSchema, TOTAL
+
+# Smallest unsigned type for a block of counts, by the largest value it holds
+UNSIGNED_TYPES = [('UInt8', 2 ** 8 - 1), ('UInt16', 2 ** 16 - 1), ('UInt32', 2 ** 32 - 1)]
+COUNT_COLUMNS = ['total', 'attended', 'percentage']
+# Enrollment numbers such as 0801CS221001: letters and digits, at least one digit
+ENROLLMENT_PATTERN = re.compile(r'(?=.*\d)[A-Z0-9][A-Z0-9/_-]*')
+
+
+def student_rows(df):
+    # Drop the TH/LAB label row, the blank spacer rows pdfplumber leaves between students,
+    # and the "S. No., Enrollment_No, Name" header some sheets repeat on every page
+    students = df.iloc[1:]
+    enrollment = students.iloc[:, 1]
+    keys = enrollment.astype(str).str.strip().str.upper()
+    label = str(df.iloc[0, 1]).strip().upper() if len(df) else None
+    is_student = enrollment.notna() & (keys != label) & keys.str.fullmatch(ENROLLMENT_PATTERN.pattern)
+    return students[is_student.fillna(False).astype(bool)]
+
+
+def clean_names(values):
+    # "AAKASH\nCHOUHAN" -> "AAKASH CHOUHAN": line breaks from wrapped PDF cells and
+    # repeated spaces collapse to one space
+    return values.fillna('').astype(str).str.replace(r'\s+', ' ', regex=True).str.strip()
+
+
+def compact_numbers(values):
+    # Whole, non-negative numbers in the smallest unsigned type that holds them (the
+    # nullable variant only when there are blanks); anything else stays float64
+    values = np.asarray(values, dtype='float64')
+    present = values[~np.isnan(values)]
+    if len(present) and ((present % 1 != 0).any() or present.min() < 0 or present.max() > UNSIGNED_TYPES[-1][1]):
+        return values
+    top = present.max() if len(present) else 0
+    dtype = next(name for name, limit in UNSIGNED_TYPES if top <= limit)
+    if len(present) == len(values):
+        return values.astype(dtype.lower())
+    return pd.array(values, dtype=dtype)
+
+
+def compact_column(values):
+    # A column outside the subject blocks: compact numbers when every cell is a number,
+    # otherwise its text as a categorical
+    numbers = pd.to_numeric(values, errors='coerce')
+    if numbers.notna().sum() == values.notna().sum():
+        return compact_numbers(numbers)
+    return pd.Categorical(values.astype('string').str.strip().to_numpy(dtype=object))
+
+
+def plain_counts(frame):
+    # Counts back in the dtypes read_csv gives: int64 without blanks, float64 with them,
+    # for writers and serializers that expect plain numpy numbers
+    return frame.astype({col: 'float64' if frame[col].hasnans or frame[col].dtype.kind == 'f' else 'int64'
+                         for col in frame.columns})
+
+
+def table_bytes(df):
+    # Memory held by a parsed table, object cells included
+    return int(df.memory_usage(deep=True).sum())
+
+
+class CompactTable:
+    # The parsed sheet normalized for analysis. Students are kept once (serial number,
+    # enrollment as a fixed-width byte key, cleaned name) and the counts in long form,
+    # one row per student per subject/type block with each block stored contiguously,
+    # so a block is a slice and a filter is one vectorized mask.
+
+    def __init__(self, schema, id_labels, serial, enrollment, names, blocks, counts, extra=None):
+        self.schema = schema
+        self.id_labels = id_labels    # Sheet labels of the S. No., enrollment and name columns
+        self.serial = serial
+        self.enrollment = enrollment  # numpy S<width> array, one key per student
+        self.names = names
+        self.blocks = blocks          # [(subject, type)] in sheet order, TOTAL last as (TOTAL, TOTAL)
+        self.counts = counts          # student, subject, type, total, attended, percentage
+        self.extra = extra or {}      # {column label: typed array} for columns outside every block
+
+    @classmethod
+    def from_table(cls, df, schema=None):
+        if len(df.columns) < 3:
+            raise ValueError('The sheet has no S. No., Enrollment and Name columns.')
+        schema = schema or SheetSchema.from_table(df)
+        students = student_rows(df)
+        id_labels = [str(label) for label in df.iloc[0, :3]] if len(df) else ['S. No.', 'Enrollment', 'Name']
+
+        keys = students.iloc[:, 1].astype(str).str.strip().str.upper()
+        width = max(1, int(keys.str.len().max())) if len(keys) else 1
+        # Enrollment numbers are ASCII; anything else keeps a fixed-width unicode key
+        kind = 'S' if all(key.isascii() for key in keys) else 'U'
+        enrollment = np.array(keys.tolist(), dtype=f'{kind}{width}')
+
+        blocks = list(schema.subjects())
+        positions = [schema.lookup(subject, kind) for subject, kind in blocks]
+        if schema.total is not None:
+            blocks.append((TOTAL, TOTAL))
+            positions.append(schema.total)
+
+        count = len(students)
+        student = np.tile(np.arange(count, dtype=np.min_scalar_type(max(count - 1, 0))), len(blocks))
+        block = np.repeat(np.arange(len(blocks)), count)
+        subjects = list(dict.fromkeys(subject for subject, _ in blocks))
+        types = list(dict.fromkeys(kind for _, kind in blocks))
+        columns = {
+            'student': student,
+            'subject': pd.Categorical.from_codes(
+                np.array([subjects.index(subject) for subject, _ in blocks], dtype='int16')[block], subjects),
+            'type': pd.Categorical.from_codes(
+                np.array([types.index(kind) for _, kind in blocks], dtype='int16')[block], types),
+        }
+        for i, name in enumerate(COUNT_COLUMNS):
+            values = [pd.to_numeric(students.iloc[:, pos[i]], errors='coerce').to_numpy(dtype='float64')
+                      for pos in positions]
+            columns[name] = compact_numbers(np.concatenate(values) if values else np.empty(0))
+
+        # Columns no block covers (sheet layouts the schema does not know) are kept per
+        # column, typed like the counts, so their numbers stay with the students
+        covered = {pos for block_positions in positions for pos in block_positions}
+        extra = {}
+        for pos in range(3, len(df.columns)):
+            values = students.iloc[:, pos]
+            if pos not in covered and values.notna().any():
+                extra[df.columns[pos]] = compact_column(values)
+
+        serial = pd.to_numeric(students.iloc[:, 0], errors='coerce')
+        # Serial numbers that are not all numbers keep their text, like read_csv would
+        serial = (compact_numbers(serial) if serial.notna().sum() == students.iloc[:, 0].notna().sum()
+                  else students.iloc[:, 0].to_numpy(dtype=object))
+        names = clean_names(students.iloc[:, 2]).reset_index(drop=True)
+        return cls(schema, id_labels, serial, enrollment, names, blocks, pd.DataFrame(columns), extra)
+
+    def __len__(self):
+        return len(self.enrollment)
+
+    @property
+    def nbytes(self):
+        return int(pd.Series(self.serial).memory_usage(deep=True, index=False) + self.enrollment.nbytes
+                   + self.names.memory_usage(deep=True, index=False) + self.counts.memory_usage(deep=True).sum()
+                   + sum(pd.Series(values).memory_usage(deep=True, index=False) for values in self.extra.values()))
+
+    def enrollments(self):
+        return self.enrollment.astype(str)
+
+    def students(self):
+        # S. No., enrollment and name per student, labelled as on the sheet
+        columns = [self.serial, self.enrollments(), self.names.to_numpy()]
+        return pd.DataFrame(dict(enumerate(columns))).set_axis(self.id_labels, axis=1)
+
+    def block(self, subject, attendance_type=None, plain=False):
+        # total/attended/percentage of one subject/type (or TOTAL), one row per student;
+        # raises the schema's ValueError for unknown blocks
+        self.schema.lookup(subject, attendance_type)
+        subject = subject.strip().upper()
+        key = (TOTAL, TOTAL) if subject == TOTAL else (subject, (attendance_type or '').strip().upper())
+        start = self.blocks.index(key) * len(self)
+        counts = self.counts.iloc[start:start + len(self), 3:].reset_index(drop=True)
+        return plain_counts(counts) if plain else counts
+
+    def records(self):
+        # Long form (enrollment, name, subject, type, total, attended, percentage)
+        student = self.counts['student'].to_numpy()
+        counts = plain_counts(self.counts[COUNT_COLUMNS])
+        return pd.DataFrame({
+            'enrollment': self.enrollments()[student], 'name': self.names.to_numpy()[student],
+            'subject': self.counts['subject'].to_numpy(), 'type': self.counts['type'].to_numpy(),
+            'total': counts['total'].to_numpy(), 'attended': counts['attended'].to_numpy(),
+            'percentage': counts['percentage'].to_numpy(),
+        })
+
+    def footprint(self, df):
+        # Bytes held by the raw parsed table against this compact form
+        return {'raw_bytes': table_bytes(df), 'compact_bytes': self.nbytes}
+
+
+def as_compact(table, schema=None):
+    # Analysis code accepts either the parsed DataFrame or its CompactTable
+    return table if isinstance(table, CompactTable) else CompactTable.from_table(table, schema)
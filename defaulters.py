@@ -0,0 +1,38 @@
+import json
+
+import pandas as pd
+
+from compact_table import as_compact, plain_counts
+from excel_writer import ATTENDANCE_THRESHOLD, below_threshold_mask
+
+DEFAULTER_COLUMNS = ['enrollment', 'name', 'total', 'attended', 'percentage']
+
+
+def find_defaulters(df, subject, attendance_type=None, threshold=ATTENDANCE_THRESHOLD, schema=None):
+    # Students under threshold for one subject/type (or TOTAL), from a single mask over
+    # the block's percentage slice of the compact table; no workbook is built
+    table = as_compact(df, schema)
+    block = table.block(subject, attendance_type)
+    below = below_threshold_mask(block['percentage'], threshold)
+
+    counts = plain_counts(block[below])
+    return pd.DataFrame({
+        'enrollment': table.enrollments()[below],
+        'name': table.names.to_numpy()[below],
+        'total': counts.iloc[:, 0].values,
+        'attended': counts.iloc[:, 1].values,
+        'percentage': counts.iloc[:, 2].values,
+    }, columns=DEFAULTER_COLUMNS)
+
+
+def defaulter_records(frame):
+    # Plain dicts with NaN as None, so they serialize as JSON null
+    frame = frame.astype(object).where(frame.notna(), None)
+    return frame.to_dict(orient='records')
+
+
+def iter_ndjson(frame, chunk_rows=1000):
+    # One JSON object per line, produced a chunk at a time so large sheets stream
+    for start in range(0, len(frame), chunk_rows):
+        chunk = defaulter_records(frame.iloc[start:start + chunk_rows])
+        yield ''.join(json.dumps(record) + '\n' for record in chunk)
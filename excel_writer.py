@@ -0,0 +1,129 @@
+import math
+
+import pandas as pd
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Border, Font, Side
+
+from highlight_rules import ATTENDANCE_THRESHOLD, HighlightRule, conditional_formats, rule_masks
+from metrics import timed_span
+from workspace import atomic_write
+# Sheets with more rows than this are streamed to disk instead of built in memory
+LOW_MEMORY_ROW_THRESHOLD = 20000
+
+# Same header look pandas' to_excel gives, so the output does not change for users
+HEADER_FONT = Font(bold=True)
+HEADER_BORDER = Border(left=Side(style='thin'), right=Side(style='thin'),
+                       top=Side(style='thin'), bottom=Side(style='thin'))
+HEADER_ALIGNMENT = Alignment(horizontal='center', vertical='top')
+
+
+def below_threshold_mask(series, threshold=ATTENDANCE_THRESHOLD):
+    # Vectorized replacement for checking every cell after writing; blanks and text never match
+    if not pd.api.types.is_numeric_dtype(series):
+        series = pd.to_numeric(series, errors='coerce')
+    return (series < threshold).fillna(False).to_numpy(dtype=bool)
+
+
+def cell_value(value):
+    # openpyxl would write NaN literally; to_excel leaves those cells empty
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    return value
+
+
+def write_highlighted_workbook(df, output_excel, highlight_columns, threshold=ATTENDANCE_THRESHOLD,
+                               low_memory=None, rules=None):
+    # Write df to output_excel in a single pass, highlighting cells of highlight_columns
+    # that fall under the rules (default: below threshold, in yellow). Returns the
+    # number of highlighted cells.
+    return write_highlighted_sheets([(None, df, highlight_columns, rules)], output_excel, threshold, low_memory)
+
+
+def write_highlighted_sheets(sheets, output_excel, threshold=ATTENDANCE_THRESHOLD, low_memory=None):
+    # Same as write_highlighted_workbook for several (sheet_name, df, highlight_columns, rules)
+    # entries, all saved into one workbook. A sheet_name of None keeps openpyxl's default;
+    # rules may be a dict of column -> rules when columns of one sheet differ.
+    # Highlighting is stored as conditional-formatting ranges, one per rule and column,
+    # so the file and the write time do not grow with the number of highlighted cells.
+    if low_memory is None:
+        low_memory = sum(len(df) for _, df, _, _ in sheets) > LOW_MEMORY_ROW_THRESHOLD
+
+    wb = Workbook(write_only=low_memory)
+    if not low_memory:
+        wb.remove(wb.active)  # Sheets are created below, in order
+
+    highlighted = 0
+    for sheet_name, df, highlight_columns, rules in sheets:
+        highlighted += write_sheet(wb.create_sheet(title=sheet_name), df, highlight_columns, rules, threshold,
+                                   low_memory)
+
+    # Save under a temporary name and rename, so concurrent requests never see a partial file
+    with timed_span('workbook_save'), atomic_write(output_excel) as tmp_path:
+        wb.save(tmp_path)
+    return highlighted
+
+
+def write_sheet(ws, df, highlight_columns, rules=None, threshold=ATTENDANCE_THRESHOLD, low_memory=False):
+    # One sheet of write_highlighted_sheets: df and its highlight rules (as conditional
+    # formats) into an empty sheet. Returns the number of highlighted cells.
+    column_rules = rules if isinstance(rules, dict) else dict.fromkeys(highlight_columns, rules)
+    default_rules = [HighlightRule(threshold, 'FFFF00')]
+    highlighted = 0
+    with timed_span('highlighting'):
+        column_positions = [(df.columns.get_loc(col), column_rules.get(col) or default_rules)
+                            for col in highlight_columns]
+        for pos, rules in column_positions:
+            highlighted += int(sum(mask.sum() for mask in rule_masks(df, pos, rules)))
+
+    with timed_span('workbook_build'):
+        if len(df):
+            for pos, rules in column_positions:
+                for cell_range, rule in conditional_formats(pos, 2, len(df) + 1, rules):
+                    ws.conditional_formatting.add(cell_range, rule)
+        if low_memory:
+            _write_streaming(ws, df)
+        else:
+            _write_in_memory(ws, df)
+    return highlighted
+
+
+def refresh_sheet_values(ws, df, columns, key_column):
+    # New values for `columns` of a sheet written earlier from a frame of the same rows,
+    # leaving its header, other cells and conditional formats as they are. Returns False,
+    # changing nothing, when the sheet's rows (matched on key_column) are not df's.
+    header = [cell.value for cell in ws[1]]
+    if header != [str(col) for col in df.columns] or ws.max_row != len(df) + 1:
+        return False
+    key = df.columns.get_loc(key_column) + 1
+    keys = [row[0] for row in ws.iter_rows(min_row=2, min_col=key, max_col=key, values_only=True)]
+    if [str(value) for value in keys] != [str(value) for value in df[key_column]]:
+        return False
+    with timed_span('workbook_build'):
+        for col in columns:
+            pos = df.columns.get_loc(col) + 1
+            for row, value in enumerate(df[col].tolist(), start=2):
+                ws.cell(row=row, column=pos).value = cell_value(value)
+    return True
+
+
+def _write_in_memory(ws, df):
+    ws.append([str(col) for col in df.columns])
+    for cell in ws[1]:
+        cell.font, cell.border, cell.alignment = HEADER_FONT, HEADER_BORDER, HEADER_ALIGNMENT
+
+    for row in df.itertuples(index=False, name=None):
+        ws.append([cell_value(value) for value in row])
+
+
+def _write_streaming(ws, df):
+    # Write-only sheets flush rows as they go, so memory stays flat for huge sheets
+    header = []
+    for col in df.columns:
+        cell = WriteOnlyCell(ws, value=str(col))
+        cell.font, cell.border, cell.alignment = HEADER_FONT, HEADER_BORDER, HEADER_ALIGNMENT
+        header.append(cell)
+    ws.append(header)
+
+    for row in df.itertuples(index=False, name=None):
+        ws.append([cell_value(value) for value in row])
@@ -0,0 +1,113 @@
+import json
+import os
+
+# pandas and openpyxl are imported where the rules are evaluated or written, so the
+# app can read its rule configuration without loading them
+
+# Default cutoff, used when no highlight rules are configured
+ATTENDANCE_THRESHOLD = 60
+# Optional JSON file replacing the default rules, e.g.
+# [{"below": 50, "color": "FF0000"}, {"below": 60, "color": "FFFF00", "types": ["TH"]}]
+HIGHLIGHT_RULES_PATH = os.environ.get('HIGHLIGHT_RULES_PATH', 'highlight_rules.json')
+# What a rule compares: the sheet's percentage column, or attended / total recomputed
+MEASURES = ('percentage', 'ratio')
+
+
+class HighlightRule:
+    # Cells whose measure is below `below` get `color`. subjects/types limit the rule
+    # to some subject/type blocks (None means all); TOTAL is subject "TOTAL".
+    def __init__(self, below, color, subjects=None, types=None, measure='percentage'):
+        if measure not in MEASURES:
+            raise ValueError(f"Unknown highlight measure {measure!r}, expected one of {', '.join(MEASURES)}.")
+        self.below = float(below)
+        self.color = color.lstrip('#').upper()
+        self.subjects = {s.strip().upper() for s in subjects} if subjects else None
+        self.types = {t.strip().upper() for t in types} if types else None
+        self.measure = measure
+
+    @property
+    def fill(self):
+        from openpyxl.styles import PatternFill
+        return PatternFill(start_color=self.color, end_color=self.color, fill_type='solid')
+
+    def applies_to(self, subject, attendance_type):
+        if self.subjects is not None and (subject or '').upper() not in self.subjects:
+            return False
+        if self.types is not None and (attendance_type or '').upper() not in self.types:
+            return False
+        return True
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['below'], data.get('color', 'FFFF00'), data.get('subjects'), data.get('types'),
+                   data.get('measure', 'percentage'))
+
+
+# The long-standing behaviour: percentages under 60 in yellow
+DEFAULT_RULES = [HighlightRule(ATTENDANCE_THRESHOLD, 'FFFF00')]
+# Severity tiers, selectable per request with rules=tiered
+TIERED_RULES = [HighlightRule(50, 'FF0000'), HighlightRule(60, 'FFFF00'), HighlightRule(75, 'FFC000')]
+RULE_PRESETS = {'default': DEFAULT_RULES, 'tiered': TIERED_RULES}
+
+
+def load_rules(path=HIGHLIGHT_RULES_PATH):
+    # Rules from the JSON config if it exists, otherwise the built-in default
+    if not path or not os.path.exists(path):
+        return DEFAULT_RULES
+    with open(path) as rules_file:
+        return [HighlightRule.from_dict(item) for item in json.load(rules_file)]
+
+
+def rules_for(rules, subject=None, attendance_type=None):
+    # Rules that apply to one subject/type block, tightest cutoff first so each
+    # cell takes the most severe tier it falls into
+    return sorted((rule for rule in rules if rule.applies_to(subject, attendance_type)), key=lambda rule: rule.below)
+
+
+def measure_values(df, pos, measure):
+    # Numbers compared by a rule for the column at `pos`. In every table this app
+    # writes the percentage column follows its total and attended columns.
+    import pandas as pd
+
+    if measure == 'ratio':
+        total = pd.to_numeric(df.iloc[:, pos - 2], errors='coerce')
+        attended = pd.to_numeric(df.iloc[:, pos - 1], errors='coerce')
+        return (attended / total.where(total > 0)) * 100
+    return pd.to_numeric(df.iloc[:, pos], errors='coerce')
+
+
+def rule_masks(df, pos, rules):
+    # One boolean mask per rule over the whole column; a cell belongs to the
+    # first (most severe) rule it matches, mirroring stopIfTrue in Excel
+    taken = None
+    masks = []
+    for rule in rules:
+        mask = (measure_values(df, pos, rule.measure) < rule.below).fillna(False).to_numpy(dtype=bool)
+        if taken is None:
+            taken = mask.copy()
+        else:
+            mask = mask & ~taken
+            taken = taken | mask
+        masks.append(mask)
+    return masks
+
+
+def conditional_formats(pos, first_row, last_row, rules):
+    # (range, FormulaRule) pairs for one column. Each rule is one range entry no matter
+    # how many rows there are. Blank and text cells never match, like the masks above.
+    from openpyxl.formatting.rule import FormulaRule
+    from openpyxl.utils import get_column_letter
+
+    col = get_column_letter(pos + 1)
+    cell = f'{col}{first_row}'
+    cell_range = f'{col}{first_row}:{col}{last_row}'
+    formats = []
+    for rule in rules:
+        if rule.measure == 'ratio':
+            total = f'{get_column_letter(pos - 1)}{first_row}'
+            attended = f'{get_column_letter(pos)}{first_row}'
+            formula = f'IFERROR(AND(VALUE({total})>0,VALUE({attended})/VALUE({total})*100<{rule.below:g}),FALSE)'
+        else:
+            formula = f'IFERROR(AND({cell}<>"",VALUE({cell})<{rule.below:g}),FALSE)'
+        formats.append((cell_range, FormulaRule(formula=[formula], fill=rule.fill, stopIfTrue=True)))
+    return formats
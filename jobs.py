@@ -0,0 +1,120 @@
+import queue
+import threading
+import time
+import uuid
+
+# Background workers processing uploads; extraction itself fans out to processes
+JOB_WORKERS = 2
+# Uploads allowed to wait for a worker before /upload starts refusing new jobs
+JOB_QUEUE_SIZE = 32
+# Finished jobs kept around for status/result polling
+JOB_HISTORY_SIZE = 256
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class QueueFullError(Exception):
+    pass
+
+
+class Job:
+    def __init__(self, func, args, kwargs):
+        self.id = uuid.uuid4().hex
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.status = QUEUED
+        self.stage = QUEUED
+        self.result = None
+        self.error = None
+        self.error_code = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    def set_stage(self, stage):
+        # Passed to the job function so it can report which step it is on
+        self.stage = stage
+
+    def to_dict(self):
+        return {
+            'job_id': self.id,
+            'status': self.status,
+            'stage': self.stage,
+            'error': self.error,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+        }
+
+
+class JobQueue:
+    # In-process job queue: a bounded queue drained by a fixed pool of daemon
+    # worker threads. Job functions receive a `progress` callback keyword.
+
+    def __init__(self, workers=JOB_WORKERS, max_queued=JOB_QUEUE_SIZE, history=JOB_HISTORY_SIZE):
+        self.history = history
+        self._queue = queue.Queue(maxsize=max_queued)
+        self._jobs = {}
+        self._finished = []
+        self._lock = threading.Lock()
+        self._threads = []
+        for i in range(workers):
+            thread = threading.Thread(target=self._worker, name=f'job-worker-{i}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, func, *args, **kwargs):
+        job = Job(func, args, kwargs)
+        with self._lock:
+            self._jobs[job.id] = job
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            with self._lock:
+                del self._jobs[job.id]
+            raise QueueFullError('Too many uploads are waiting to be processed, try again shortly.')
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def stats(self):
+        with self._lock:
+            counts = {QUEUED: 0, RUNNING: 0, DONE: 0, FAILED: 0}
+            for job in self._jobs.values():
+                counts[job.status] += 1
+        counts['workers'] = len(self._threads)
+        return counts
+
+    def _worker(self):
+        while True:
+            job = self._queue.get()
+            job.status = RUNNING
+            job.started_at = time.time()
+            try:
+                job.result = job.func(*job.args, progress=job.set_stage, **job.kwargs)
+                job.status = DONE
+                job.stage = DONE
+            except ValueError as e:
+                job.error, job.error_code = str(e), 400
+                job.status = FAILED
+            except Exception as e:
+                # Errors may carry their own HTTP status (e.g. MemoryLimitExceeded -> 413)
+                job.error, job.error_code = str(e), getattr(e, 'status_code', 500)
+                job.status = FAILED
+            finally:
+                job.finished_at = time.time()
+                self._forget_old_jobs(job)
+                self._queue.task_done()
+
+    def _forget_old_jobs(self, job):
+        # Keep memory flat: only the most recent finished jobs remain pollable
+        with self._lock:
+            self._finished.append(job.id)
+            while len(self._finished) > self.history:
+                self._jobs.pop(self._finished.pop(0), None)
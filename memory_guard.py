@@ -0,0 +1,108 @@
+import os
+import sys
+import threading
+
+try:
+    import resource
+except ImportError:  # Windows has no resource module; memory is then not tracked
+    resource = None
+
+# Memory one job may add to a process while extracting a document, in MB, measured
+# from the resident size once the extraction libraries are imported; 0 disables the
+# check. Enforced after every page in the app process and in each pool worker (which
+# only ever runs pages of one job), the same way in both.
+MEMORY_CEILING_MB = int(os.environ.get('EXTRACT_MEMORY_CEILING_MB', '0') or 0)
+
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+class MemoryLimitExceeded(MemoryError):
+    # Reported to clients as 413: the document is too large for this worker's limit
+    status_code = 413
+
+
+def current_rss_bytes():
+    # Resident set size right now; /proc on Linux, otherwise the lifetime peak as a
+    # bound, or None where neither is available
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * _PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        return peak_rss_bytes()
+
+
+def peak_rss_bytes():
+    # Highest resident size this process ever reached (ru_maxrss is KB on Linux, bytes
+    # on macOS), or None without the resource module
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def check_memory(ceiling_mb=None, baseline=0):
+    # Current RSS, raising MemoryLimitExceeded once it grew more than the ceiling past
+    # baseline; None (and no check) where RSS cannot be read
+    ceiling_mb = MEMORY_CEILING_MB if ceiling_mb is None else ceiling_mb
+    rss = current_rss_bytes()
+    if rss is None:
+        return None
+    if ceiling_mb and rss - baseline > ceiling_mb * 1024 * 1024:
+        raise MemoryLimitExceeded(f"Extraction used {(rss - baseline) / (1024 * 1024):.0f} MB, over the "
+                                  f"{ceiling_mb} MB limit. Split the document or raise EXTRACT_MEMORY_CEILING_MB.")
+    return rss
+
+
+class MemoryTracker:
+    # Memory one job added while it ran: the app process's growth over its resident
+    # size when extraction started (see rebase), and the peak of the pool workers that
+    # reported back.
+    # Samples are taken per page. Jobs running side by side share the app process, so
+    # its growth during a job can include a neighbour's pages; the ceiling only bounds
+    # growth, so a job never pays for memory that was already in use when it started.
+    # Where RSS cannot be read (Windows) the tracker records and enforces nothing.
+
+    def __init__(self, ceiling_mb=None):
+        self.ceiling_mb = MEMORY_CEILING_MB if ceiling_mb is None else ceiling_mb
+        self.baseline_bytes = current_rss_bytes()
+        self.peak_bytes = 0
+        self.worker_peak_bytes = 0
+        self._lock = threading.Lock()
+
+    @property
+    def available(self):
+        return self.baseline_bytes is not None
+
+    def rebase(self):
+        # Take the baseline again after a stage's imports, so loading a library the
+        # first time is not counted as the job's growth. Only before the first sample.
+        if self.available and not self.peak_bytes:
+            self.baseline_bytes = current_rss_bytes()
+
+    def sample(self, enforce=True):
+        if not self.available:
+            return None
+        if enforce:
+            rss = check_memory(self.ceiling_mb, self.baseline_bytes)
+        else:
+            rss = current_rss_bytes()
+        with self._lock:
+            self.peak_bytes = max(self.peak_bytes, rss)
+        return rss
+
+    def observe_worker(self, rss):
+        if rss is None:
+            return
+        with self._lock:
+            self.worker_peak_bytes = max(self.worker_peak_bytes, rss)
+
+    def to_dict(self):
+        mb = 1024 * 1024
+        if not self.available:
+            return {'peak_rss_mb': None, 'growth_mb': None, 'worker_peak_rss_mb': None,
+                    'ceiling_mb': self.ceiling_mb or None}
+        peak = max(self.peak_bytes, self.baseline_bytes)
+        return {'peak_rss_mb': round(peak / mb, 1),
+                'growth_mb': round((peak - self.baseline_bytes) / mb, 1),
+                'worker_peak_rss_mb': round(self.worker_peak_bytes / mb, 1) if self.worker_peak_bytes else None,
+                'ceiling_mb': self.ceiling_mb or None}
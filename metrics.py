@@ -0,0 +1,96 @@
+import threading
+import time
+from contextlib import contextmanager
+
+# Latency buckets in seconds, from a cached highlight (~10ms) to a long OCR job
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+def _label_text(labels):
+    if not labels:
+        return ''
+    parts = ','.join(f'{key}="{value}"' for key, value in labels)
+    return '{' + parts + '}'
+
+
+class Counter:
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help_text = help_text
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} counter']
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f'{self.name}{_label_text(key)} {value}')
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        self._series = {}  # labels -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._series.setdefault(key, [0] * len(self.buckets) + [0.0, 0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                for bound, count in zip(self.buckets, series):
+                    lines.append(f'{self.name}_bucket{_label_text(key + (("le", bound),))} {count}')
+                lines.append(f'{self.name}_bucket{_label_text(key + (("le", "+Inf"),))} {series[-1]}')
+                lines.append(f'{self.name}_sum{_label_text(key)} {series[-2]}')
+                lines.append(f'{self.name}_count{_label_text(key)} {series[-1]}')
+        return lines
+
+
+STAGE_SECONDS = Histogram('attendance_stage_duration_seconds', 'Time spent in each processing stage.')
+REQUEST_SECONDS = Histogram('attendance_request_duration_seconds', 'HTTP request latency by endpoint.')
+REQUESTS = Counter('attendance_requests_total', 'HTTP requests by endpoint and status code.')
+PAGES = Counter('attendance_pages_total', 'PDF pages extracted, by route (text or ocr).')
+ROWS = Counter('attendance_rows_total', 'Table rows loaded into the analysis table.')
+
+REGISTRY = [STAGE_SECONDS, REQUEST_SECONDS, REQUESTS, PAGES, ROWS]
+
+
+@contextmanager
+def timed_span(stage):
+    # Record how long the wrapped block took under attendance_stage_duration_seconds
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage=stage)
+
+
+def render_metrics(extra_lines=()):
+    # Prometheus text exposition format (version 0.0.4)
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    lines.extend(extra_lines)
+    return '\n'.join(lines) + '\n'
+
+
+def render_gauge(name, help_text, value, kind='gauge'):
+    # For values owned elsewhere (cache and job counters) that are read at scrape time
+    return [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}', f'{name} {value}']
@@ -0,0 +1,68 @@
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+
+from pdf_extract import count_pages
+
+logger = logging.getLogger(__name__)
+
+# Tesseract is single-threaded per page, so one worker per core keeps the box busy
+# unless OCR_WORKERS says otherwise
+OCR_WORKERS = int(os.environ.get('OCR_WORKERS', '0') or 0) or os.cpu_count() or 1
+# pdf2image's default resolution; higher is slower and needs more memory per page
+OCR_DPI = 200
+
+
+def ocr_page_rows(pdf_path, page_number, dpi=OCR_DPI, image_folder=None):
+    # Rasterize and OCR a single page (1-based). Only this page's image is ever
+    # held in memory, and it is dropped as soon as its text has been read.
+    # Imported here so the OCR stack is only loaded once a scanned page turns up
+    import pytesseract
+    from pdf2image import convert_from_path
+
+    images = convert_from_path(pdf_path, dpi=dpi, first_page=page_number, last_page=page_number)
+    if not images:
+        return []
+    image = images[0]
+
+    # Debug PNGs are only written when asked for
+    if image_folder:
+        image.save(os.path.join(image_folder, f'page_{page_number}.png'), 'PNG')
+
+    text = pytesseract.image_to_string(image)
+    image.close()
+
+    # Split the text into lines and each line into cells
+    return [line.split() for line in text.splitlines() if line.strip()]
+
+
+def iter_ocr_pages(pdf_path, page_numbers, workers=None, dpi=OCR_DPI, image_folder=None, pool=None):
+    # OCR the given 1-based pages across a process pool, yielding one list of rows per
+    # page in the order requested. Each worker rasterizes its own page, so peak memory
+    # is bounded by the worker count rather than the document length. A caller's `pool`
+    # is used instead of starting one.
+    workers = OCR_WORKERS if workers is None else workers
+    page_numbers = list(page_numbers)
+
+    if pool is None and (workers <= 1 or len(page_numbers) < 2):
+        for page_number in page_numbers:
+            yield ocr_page_rows(pdf_path, page_number, dpi, image_folder)
+        return
+
+    count = len(page_numbers)
+    workers = min(workers, count)
+    if pool is None:
+        logger.info("Running OCR on %d pages from %s with %d workers", count, pdf_path, workers)
+    with nullcontext(pool) if pool is not None else ProcessPoolExecutor(max_workers=workers) as pool:
+        yield from pool.map(ocr_page_rows, [pdf_path] * count, page_numbers,
+                            [dpi] * count, [image_folder] * count)
+
+
+def ocr_pdf_rows(pdf_path, workers=None, dpi=OCR_DPI, image_folder=None, pool=None):
+    # OCR every page of a scanned PDF and return the rows in page order
+    rows = []
+    for page_rows in iter_ocr_pages(pdf_path, range(1, count_pages(pdf_path) + 1), workers, dpi, image_folder,
+                                    pool):
+        rows.extend(page_rows)
+    return rows
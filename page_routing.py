@@ -0,0 +1,42 @@
+import logging
+
+from memory_guard import MemoryTracker
+from metrics import PAGES, timed_span
+from ocr import iter_ocr_pages
+from pdf_extract import classify_pages, iter_pages
+
+logger = logging.getLogger(__name__)
+
+
+def stream_routed_rows(pdf_path, workers=None, ocr_workers=None, image_folder=None, memory=None, pool=None):
+    # Send pages with a text layer through pdfplumber and only image-only pages
+    # through OCR. Returns a generator of rows merged back in page order, plus the
+    # number of pages that took each route (known up front from the classifier).
+    # `pool`, when given, runs the pages of both routes.
+    with timed_span('classify_pages'):
+        is_text = classify_pages(pdf_path)
+    text_pages = [i for i, text in enumerate(is_text) if text]
+    image_pages = [i for i, text in enumerate(is_text) if not text]
+
+    routes = {'text': len(text_pages), 'ocr': len(image_pages)}
+    logger.info("Routing %s: %d text pages, %d OCR pages", pdf_path, routes['text'], routes['ocr'])
+    memory = memory or MemoryTracker()
+    return _merge_pages(pdf_path, is_text, text_pages, image_pages, workers, ocr_workers, image_folder,
+                        memory, pool), routes
+
+
+def _merge_pages(pdf_path, is_text, text_pages, image_pages, workers, ocr_workers, image_folder, memory, pool):
+    # Both sources yield lazily in page order, so the merged stream only waits on
+    # the page it needs next. OCR page numbers are 1-based.
+    text_results = iter_pages(pdf_path, text_pages, workers, memory=memory, pool=pool)
+    ocr_results = iter_ocr_pages(pdf_path, [i + 1 for i in image_pages], ocr_workers, image_folder=image_folder,
+                                 pool=pool)
+    for text in is_text:
+        # Time spent waiting on each route is recorded per page
+        route = 'text' if text else 'ocr'
+        with timed_span('pdf_text_extraction' if text else 'ocr'):
+            page_rows = next(text_results if text else ocr_results)
+        PAGES.inc(route=route)
+        if not text:
+            memory.sample()
+        yield from page_rows
@@ -0,0 +1,118 @@
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+
+from memory_guard import MemoryTracker, check_memory, current_rss_bytes
+
+logger = logging.getLogger(__name__)
+
+# Worker processes used for table extraction; pdfplumber is CPU-bound so one per core
+# unless PDF_EXTRACT_WORKERS says otherwise
+PDF_EXTRACT_WORKERS = int(os.environ.get('PDF_EXTRACT_WORKERS', '0') or 0) or os.cpu_count() or 1
+# Below this many pages the process pool startup costs more than it saves
+PARALLEL_MIN_PAGES = 4
+# Pages with fewer extractable characters than this are treated as scanned images
+TEXT_PAGE_MIN_CHARS = 20
+
+
+def count_pages(pdf_path):
+    import pdfplumber
+
+    with pdfplumber.open(pdf_path) as pdf:
+        return len(pdf.pages)
+
+
+def classify_pages(pdf_path, min_chars=TEXT_PAGE_MIN_CHARS):
+    # True for pages with a text layer, False for image-only (scanned) pages.
+    # pdfium counts characters without pdfplumber's full layout analysis, so this
+    # costs milliseconds per page.
+    import pypdfium2
+
+    pdf = pypdfium2.PdfDocument(pdf_path)
+    try:
+        is_text = []
+        for page in pdf:
+            text_page = page.get_textpage()
+            is_text.append(text_page.count_chars() >= min_chars)
+            text_page.close()
+            page.close()
+        return is_text
+    finally:
+        pdf.close()
+
+
+def extract_page_rows(pdf_path, page_index):
+    # Runs inside a worker: open only the requested page (1-based for pdfplumber)
+    import pdfplumber
+
+    with pdfplumber.open(pdf_path, pages=[page_index + 1]) as pdf:
+        page = pdf.pages[0]
+        table = page.extract_table()
+        page.close()
+    return table or []
+
+
+# A pool worker's resident size once pdfplumber is imported, set on its first page
+_worker_baseline = None
+
+
+def _extract_page_in_worker(pdf_path, page_index, ceiling_mb):
+    # extract_page_rows plus the worker's resident memory afterwards; its growth past
+    # the worker's baseline is checked against the ceiling
+    global _worker_baseline
+    import pdfplumber  # noqa: F401 -- imported before the baseline is taken
+
+    if _worker_baseline is None:
+        _worker_baseline = current_rss_bytes() or 0
+    rows = extract_page_rows(pdf_path, page_index)
+    return rows, check_memory(ceiling_mb, _worker_baseline)
+
+
+def iter_pages(pdf_path, page_indexes, workers=None, min_pages=PARALLEL_MIN_PAGES, memory=None, pool=None):
+    # Yield the table rows of the given 0-based pages, one list of rows per page in
+    # the order requested, splitting pages across worker processes for large documents.
+    # Each page's cached chars and layout objects are released as soon as its rows are
+    # out, so memory stays flat with document length; `memory` (a MemoryTracker)
+    # records peak RSS and enforces its ceiling after every page. A caller's `pool` (a
+    # ProcessPoolExecutor shared by concurrent documents) is used instead of starting one.
+    import pdfplumber
+
+    workers = PDF_EXTRACT_WORKERS if workers is None else workers
+    memory = memory or MemoryTracker()
+    memory.rebase()
+    page_indexes = list(page_indexes)
+
+    if pool is None and (workers <= 1 or len(page_indexes) < max(min_pages, 2)):
+        with pdfplumber.open(pdf_path) as pdf:
+            for i in page_indexes:
+                page = pdf.pages[i]
+                rows = page.extract_table() or []
+                page.close()
+                memory.sample()
+                yield rows
+        return
+
+    workers = min(workers, len(page_indexes))
+    count = len(page_indexes)
+    if pool is None:
+        logger.info("Extracting %d pages from %s with %d workers", count, pdf_path, workers)
+    with nullcontext(pool) if pool is not None else ProcessPoolExecutor(max_workers=workers) as pool:
+        # map() yields results in submission order, so rows come back in page order
+        for rows, worker_rss in pool.map(_extract_page_in_worker, [pdf_path] * count, page_indexes,
+                                         [memory.ceiling_mb] * count):
+            memory.observe_worker(worker_rss)
+            memory.sample()
+            yield rows
+
+
+def extract_pages(pdf_path, page_indexes, workers=None, min_pages=PARALLEL_MIN_PAGES):
+    return list(iter_pages(pdf_path, page_indexes, workers, min_pages))
+
+
+def extract_table_rows(pdf_path, workers=None, min_pages=PARALLEL_MIN_PAGES):
+    # Extract the attendance table rows from every page, in page order
+    rows = []
+    for page_rows in extract_pages(pdf_path, range(count_pages(pdf_path)), workers, min_pages):
+        rows.extend(page_rows)
+    return rows
@@ -0,0 +1,58 @@
+TOTAL = 'TOTAL'
+
+
+class SheetSchema:
+    # Index of the attendance sheet header, built once per parsed table from the two
+    # header rows: the subject row (the DataFrame columns) and the TH/LAB type row
+    # (the first data row). Maps (subject, type) to the positions of its
+    # total/attended/percentage columns so lookups never rescan df.columns.
+
+    def __init__(self, blocks, total):
+        self.blocks = blocks  # {(subject, type): (total_pos, attended_pos, percentage_pos)}
+        self.total = total    # Positions of the overall TOTAL block (last three columns)
+
+    @classmethod
+    def from_table(cls, df):
+        blocks = {}
+        if len(df) == 0 or len(df.columns) < 6:
+            return cls(blocks, None)
+
+        subject = None
+        type_row = df.iloc[0]
+        # A named column starts a new subject, and every TH/LAB label in the type row
+        # starts a 3-column block, so LAB-only subjects (DT, SDL) are found directly
+        for i in range(3, len(df.columns) - 3):
+            header = str(df.columns[i])
+            if not header.startswith('Unnamed'):
+                subject = header.strip().upper()
+            kind = type_row.iloc[i]
+            if subject and isinstance(kind, str) and kind.strip():
+                blocks.setdefault((subject, kind.strip().upper()), (i, i + 1, i + 2))
+
+        last = len(df.columns) - 1
+        return cls(blocks, (last - 2, last - 1, last))
+
+    def subjects(self):
+        # (subject, type) pairs in sheet order
+        return list(self.blocks)
+
+    def lookup(self, subject, attendance_type=None):
+        subject = subject.strip().upper()
+        if subject == TOTAL:
+            if self.total is None:
+                raise ValueError("Attendance data for TOTAL not found.")
+            return self.total
+
+        attendance_type = (attendance_type or '').strip().upper()
+        positions = self.blocks.get((subject, attendance_type))
+        if positions is not None:
+            return positions
+
+        if any(known == subject for known, _ in self.blocks):
+            kind = 'Lab' if attendance_type == 'LAB' else 'Theory'
+            raise ValueError(f"The subject {subject} does not have {kind} attendance data.")
+        raise ValueError(f"Attendance data for subject {subject} not found.")
+
+    def column_names(self, df, subject, attendance_type=None):
+        # Column labels for a block, for code that indexes the DataFrame by name
+        return [df.columns[pos] for pos in self.lookup(subject, attendance_type)]
@@ -0,0 +1,63 @@
+import pandas as pd
+
+from excel_writer import ATTENDANCE_THRESHOLD
+
+# Kinds of change between two snapshots of the same section
+NEW_STUDENT = 'new_student'
+NEWLY_BELOW = 'newly_below'
+RECOVERED = 'recovered'
+UPDATED = 'updated'
+REMOVED = 'removed'
+# Changes that alter what a highlighted workbook shows, the only ones reported by
+# default: cumulative snapshots move nearly every count, which alone is not news
+HIGHLIGHT_CHANGES = (NEW_STUDENT, NEWLY_BELOW, RECOVERED, REMOVED)
+
+KEY_COLUMNS = ['enrollment', 'subject', 'type']
+VALUE_COLUMNS = ['total', 'attended', 'percentage']
+CHANGE_COLUMNS = (['enrollment', 'name', 'subject', 'type', 'change']
+                  + [f'previous_{col}' for col in VALUE_COLUMNS] + VALUE_COLUMNS)
+
+
+def diff_records(previous, current, threshold=ATTENDANCE_THRESHOLD, kinds=HIGHLIGHT_CHANGES):
+    # Rows that differ between two long-form snapshots (see attendance_store.attendance_records),
+    # keyed by enrollment, subject and type. One outer merge; unchanged rows are dropped, and
+    # so are changes not in kinds (None keeps plain updates too).
+    previous = previous[KEY_COLUMNS + ['name'] + VALUE_COLUMNS].drop_duplicates(KEY_COLUMNS, keep='last')
+    current = current[KEY_COLUMNS + ['name'] + VALUE_COLUMNS].drop_duplicates(KEY_COLUMNS, keep='last')
+    merged = previous.merge(current, on=KEY_COLUMNS, how='outer', suffixes=('_previous', ''), indicator=True)
+
+    def differs(col):
+        before, after = merged[f'{col}_previous'], merged[col]
+        return ~((before == after) | (before.isna() & after.isna()))
+
+    changed = differs('total') | differs('attended') | differs('percentage')
+    was_below = merged['percentage_previous'] < threshold
+    is_below = merged['percentage'] < threshold
+    known = set(previous['enrollment'])
+
+    change = pd.Series(UPDATED, index=merged.index, dtype=object)
+    change[was_below & ~is_below & merged['percentage'].notna()] = RECOVERED
+    change[~was_below & is_below & merged['percentage_previous'].notna()] = NEWLY_BELOW
+    change[merged['_merge'] == 'left_only'] = REMOVED
+    change[(merged['_merge'] == 'right_only') & ~merged['enrollment'].isin(known)] = NEW_STUDENT
+    keep = changed | (merged['_merge'] != 'both')
+    if kinds is not None:
+        keep &= change.isin(kinds)
+
+    result = merged[keep].copy()
+    result['change'] = change[keep]
+    result['name'] = result['name'].fillna(result['name_previous'])
+    result = result.rename(columns={f'{col}_previous': f'previous_{col}' for col in VALUE_COLUMNS})
+    return result[CHANGE_COLUMNS].reset_index(drop=True)
+
+
+def change_summary(changes):
+    # Count per change kind, e.g. {'newly_below': 3, 'updated': 40}
+    return {kind: int(count) for kind, count in changes['change'].value_counts().items()}
+
+
+def affected_blocks(changes, kinds=None):
+    # (subject, type) pairs with at least one change of the given kinds
+    if kinds is not None:
+        changes = changes[changes['change'].isin(kinds)]
+    return sorted(set(zip(changes['subject'], changes['type'])))
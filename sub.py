@@ -1,30 +1,103 @@
 import os
 import csv
-import pdfplumber
-import pytesseract
-import pandas as pd
-from PIL import Image
-from flask import Flask, request, jsonify, send_from_directory
+import importlib
+import logging
+import mimetypes
+import time
+from flask import Blueprint, Flask, Response, g, request, jsonify, send_file
 from flask_cors import CORS
-from openpyxl import load_workbook
-from openpyxl.styles import PatternFill
+from werkzeug.exceptions import NotFound
+from werkzeug.security import safe_join
 from werkzeug.utils import secure_filename
-
-app = Flask(__name__)
-CORS(app)
+from attendance_store import AttendanceStore, ATTENDANCE_STORE_PATH, QUERY_ROW_LIMIT
+from schema import SheetSchema
+from workspace import atomic_write, find_upload, gzip_variant, save_upload, workspace_name
+from artifact_index import ArtifactIndex, ARTIFACT_INDEX_PATH
+from table_cache import TableCache, TABLE_CACHE_MAX_BYTES, hash_file_bytes
+from bulk_upload import expand_uploads, run_concurrently
+from highlight_rules import ATTENDANCE_THRESHOLD, RULE_PRESETS, load_rules, rules_for
+from jobs import JobQueue, QueueFullError, DONE, FAILED, JOB_WORKERS
+from memory_guard import MemoryLimitExceeded, MemoryTracker
+from metrics import REQUESTS, REQUEST_SECONDS, ROWS, render_gauge, render_metrics, timed_span
+
+# LOG_LEVEL=DEBUG brings back the DataFrame dumps and per-column details
+logging.basicConfig(level=os.environ.get('LOG_LEVEL', 'INFO'), format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+logger = logging.getLogger(__name__)
 
 UPLOAD_FOLDER = 'uploads'
 RESULTS_BASE_FOLDER = 'results'
 CSV_BASE_FOLDER = 'csv'
 EXCEL_BASE_FOLDER = 'excel'
-
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-
-def create_folders_for_file(file_name):
-    base_name = os.path.splitext(file_name)[0]
-    results_folder = os.path.join(RESULTS_BASE_FOLDER, base_name)
-    csv_folder = os.path.join(CSV_BASE_FOLDER, base_name)
-    excel_folder = os.path.join(EXCEL_BASE_FOLDER, base_name)
+# Build the table straight from extracted PDF rows or workbook rows, writing data.csv
+# as the rows go by instead of reading it back
+STREAM_EXTRACTION = True
+# A PDF whose text pages hold no table (a 400, not a reason to OCR it)
+NO_TABLE_MESSAGE = 'No attendance table found in the document.'
+# Rows that changed since the previous snapshot, written by /ingest
+CHANGES_REPORT_NAME = 'CHANGES_highlighted_attendance.xlsx'
+# Downloads that also get a pre-compressed gzip copy (workbooks are already zip files)
+GZIP_EXTENSIONS = ('.csv',)
+
+# Parsed tables keyed by upload content, so re-uploading a sheet to pick another subject skips extraction
+table_cache = TableCache(max_bytes=TABLE_CACHE_MAX_BYTES)
+
+# Created by create_app(): background workers for /upload?async=true, the index of
+# processed documents and generated files, and the long-form store of every parsed sheet
+job_queue = None
+artifact_index = None
+attendance_store = None
+
+# Heavy modules imported ahead of the first request by warm_up(); 'all' adds the OCR stack
+CORE_MODULES = ['pandas', 'openpyxl', 'pdfplumber', 'pypdfium2', 'attendance_table', 'page_routing',
+                'excel_writer', 'batch_report', 'defaulters', 'snapshot_diff']
+OCR_MODULES = ['PIL.Image', 'pytesseract', 'pdf2image']
+# Set to core or all to warm up every worker at startup
+PRELOAD = os.environ.get('ATTENDANCE_PRELOAD', '').strip().lower()
+
+bp = Blueprint('attendance', __name__)
+
+def warm_up(level='core'):
+    # Import the heavy modules now (e.g. from a gunicorn preload or a readiness probe)
+    # so no user request pays for them. Returns the seconds spent per module.
+    timings = {}
+    for name in CORE_MODULES + (OCR_MODULES if level == 'all' else []):
+        start = time.perf_counter()
+        try:
+            importlib.import_module(name)
+        except ImportError as e:
+            logger.warning("Could not preload %s: %s", name, e)
+            continue
+        timings[name] = round(time.perf_counter() - start, 6)
+    logger.info("Warmed up %d modules in %.3fs", len(timings), sum(timings.values()))
+    return timings
+
+def create_app(preload=None):
+    # Application factory. pandas, openpyxl, pdfplumber and the OCR stack are only
+    # imported by the code paths that use them, so a worker that just serves downloads
+    # starts quickly; preload='core' or 'all' (default $ATTENDANCE_PRELOAD) imports them up front.
+    global job_queue, artifact_index, attendance_store
+    os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+    if job_queue is None:
+        job_queue = JobQueue(workers=JOB_WORKERS)
+    if artifact_index is None:
+        artifact_index = ArtifactIndex(ARTIFACT_INDEX_PATH)
+    if attendance_store is None:
+        attendance_store = AttendanceStore(ATTENDANCE_STORE_PATH)
+
+    app = Flask(__name__)
+    CORS(app)
+    app.register_blueprint(bp)
+
+    preload = PRELOAD if preload is None else preload
+    if preload:
+        warm_up(preload)
+    return app
+
+def create_folders_for_file(workspace):
+    # One folder per uploaded content (see workspace_name), so concurrent uploads never share files
+    results_folder = os.path.join(RESULTS_BASE_FOLDER, workspace)
+    csv_folder = os.path.join(CSV_BASE_FOLDER, workspace)
+    excel_folder = os.path.join(EXCEL_BASE_FOLDER, workspace)
     
     os.makedirs(results_folder, exist_ok=True)
     os.makedirs(csv_folder, exist_ok=True)
@@ -32,57 +105,51 @@ def create_folders_for_file(file_name):
     
     return results_folder, csv_folder, excel_folder
 
-def extract_data_from_pdf(pdf_path, csv_folder):
+def write_rows_csv(rows, csv_folder):
+    # Extracted rows as data.csv; a document whose pages gave no table is a client error
     csv_path = os.path.join(csv_folder, 'data.csv')
-    with pdfplumber.open(pdf_path) as pdf:
-        with open(csv_path, 'w', newline='') as csv_file:
+    rows = list(rows)
+    if not rows:
+        raise ValueError(NO_TABLE_MESSAGE)
+    with atomic_write(csv_path) as tmp_path:
+        with open(tmp_path, 'w', newline='') as csv_file:
             writer = csv.writer(csv_file)
-            for page in pdf.pages:
-                table = page.extract_table()
-                if table:
-                    writer.writerows(table)
-    print(f"Extracted data from PDF to {csv_path}")  # Log the CSV path
+            writer.writerows(rows)
+    logger.info("Extracted data from PDF to %s", csv_path)  # Log the CSV path
     return csv_path
 
-def extract_data_from_image_pdf(pdf_path, csv_folder):
-    from pdf2image import convert_from_path
-
-    # Convert PDF pages to images
-    images = convert_from_path(pdf_path)
-    extracted_data = []
+def written_rows(rows, writer):
+    # The rows, unchanged, each one written to the CSV writer on its way through
+    for row in rows:
+        writer.writerow(row)
+        yield row
 
-    for i, image in enumerate(images):
-        image_path = os.path.join(csv_folder, f'page_{i + 1}.png')
-        image.save(image_path, 'PNG')
+def extract_data_from_image_pdf(pdf_path, csv_folder, workers=None, debug_images=False, pool=None):
+    # The OCR stack is only imported when a document actually needs OCR
+    from ocr import ocr_pdf_rows
 
-        # Perform OCR on the image
-        text = pytesseract.image_to_string(image)
-
-        # Optional: Process the text here to extract structured data
-        # For example, you can split the text into lines and process accordingly
-        lines = text.splitlines()
-        for line in lines:
-            if line.strip():  # Skip empty lines
-                extracted_data.append(line.split())  # Adjust this to fit your desired CSV format
+    # Pages are rasterized and OCR'd one at a time per worker, so memory stays bounded
+    image_folder = csv_folder if debug_images else None
+    extracted_data = ocr_pdf_rows(pdf_path, workers=workers, image_folder=image_folder, pool=pool)
 
     # Save OCR results into a CSV file
     csv_path = os.path.join(csv_folder, 'ocr_data.csv')
-    with open(csv_path, 'w', newline='') as csv_file:
-        writer = csv.writer(csv_file)
-        writer.writerows(extracted_data)  # Write the structured data
+    with atomic_write(csv_path) as tmp_path:
+        with open(tmp_path, 'w', newline='') as csv_file:
+            writer = csv.writer(csv_file)
+            writer.writerows(extracted_data)  # Write the structured data
 
-    print(f"Extracted OCR data to {csv_path}")  # Log the CSV path
+    logger.info("Extracted OCR data to %s", csv_path)  # Log the CSV path
     return csv_path
 
-def highlight_attendance(csv_path, excel_folder, subject, attendance_type, highlight_last_column=False):
-    # Load the CSV file
-
-    
-    df = pd.read_csv(csv_path, skiprows=5)
+def highlight_attendance(df, excel_folder, subject, attendance_type, highlight_last_column=False, schema=None, low_memory=None,
+                         rules=None):
+    from excel_writer import write_highlighted_workbook
 
     # Log the DataFrame for debugging
-    print("DataFrame Columns:", df.columns.tolist())
-    print("DataFrame Head:\n", df.head())  # Log the first few rows of the DataFrame
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("DataFrame Columns: %s", df.columns.tolist())
+        logger.debug("DataFrame Head:\n%s", df.head())  # Log the first few rows of the DataFrame
 
     # Clean subject input
     subject = subject.strip().upper()
@@ -91,64 +158,398 @@ def highlight_attendance(csv_path, excel_folder, subject, attendance_type, highl
     if subject == "TOTAL":
         highlight_last_column = True  # Set this flag to True to highlight the last column
 
-    # Write DataFrame to Excel
     output_excel = os.path.join(excel_folder, f'{subject}_highlighted_attendance.xlsx')
-    df.to_excel(output_excel, index=False)
-    print(f"Written DataFrame to Excel: {output_excel}")  # Log the Excel path
-
-    # Load the Excel file with openpyxl for styling
-    wb = load_workbook(output_excel)
-    ws = wb.active
-
-    # Yellow fill for cells with less than 60% attendance
-    yellow_fill = PatternFill(start_color="FFFF00", end_color="FFFF00", fill_type="solid")
 
+    rules = rules if rules is not None else load_rules()
     # If highlighting the last column
     if highlight_last_column:
         percentage_col = df.columns[-1]  # Last column for highlighting
-        percentage_idx = df.columns.get_loc(percentage_col) + 1  # Get 1-based index
-        
-        # Highlight cells with attendance < 60% in the last column
-        for row in range(2, ws.max_row + 1):  # Skip the header
-            percentage_value = ws.cell(row=row, column=percentage_idx).value
-            if isinstance(percentage_value, (int, float)) and percentage_value < 60:
-                ws.cell(row=row, column=percentage_idx).fill = yellow_fill
-                print(f"Highlighted row {row} in column {percentage_col} with value {percentage_value}")  # Log highlighting
+        rules = rules_for(rules, 'TOTAL')
     else:
-        # Find the specific attendance columns
-        total_classes_col, present_classes_col, percentage_col = None, None, None
-        subject_columns = df.columns.tolist()
-
-        for i in range(len(subject_columns)):
-            if subject_columns[i].strip().upper() == subject:
-                if attendance_type == 'TH':
-                    total_classes_col = subject_columns[i]
-                    present_classes_col = subject_columns[i + 1]
-                    percentage_col = subject_columns[i + 2]
-                elif attendance_type == 'LAB':
-                    total_classes_col = subject_columns[i + 3]
-                    present_classes_col = subject_columns[i + 4]
-                    percentage_col = subject_columns[i + 5]
-                break
-
-        if not total_classes_col or not present_classes_col or not percentage_col:
-            raise ValueError(f"Attendance data for subject {subject} not found.")
-        
-        print(f"Columns found - Total Classes: {total_classes_col}, Present Classes: {present_classes_col}, Percentage: {percentage_col}")  # Log column info
-        
-        # Highlight cells with attendance < 60% in the specific percentage column
-        percentage_idx = df.columns.get_loc(percentage_col) + 1  # Get 1-based index
-        for row in range(2, ws.max_row + 1):  # Skip the header
-            percentage_value = ws.cell(row=row, column=percentage_idx).value
-            if isinstance(percentage_value, (int, float)) and percentage_value < 60:
-                ws.cell(row=row, column=percentage_idx).fill = yellow_fill
-                print(f"Highlighted row {row} in column {percentage_col} with value {percentage_value}")  # Log highlighting
-
-    wb.save(output_excel)  # Ensure the workbook is saved
-    print(f"Saved highlighted Excel file: {output_excel}")  # Log the final save
+        # Find the specific attendance columns from the header index
+        schema = schema or SheetSchema.from_table(df)
+        total_classes_col, present_classes_col, percentage_col = schema.column_names(df, subject, attendance_type)
+        logger.debug("Columns found - Total Classes: %s, Present Classes: %s, Percentage: %s",
+                     total_classes_col, present_classes_col, percentage_col)  # Log column info
+        rules = rules_for(rules, subject, attendance_type)
+
+    # Write the workbook once, with the highlight rules stored as conditional formatting
+    highlighted = write_highlighted_workbook(df, output_excel, [percentage_col], low_memory=low_memory, rules=rules)
+    logger.info("Highlighted %d rows in column %s", highlighted, percentage_col)  # Log highlighting
+    logger.info("Saved highlighted Excel file: %s", output_excel)  # Log the final save
     return output_excel
 
-@app.route('/upload', methods=['POST'])
+def parse_highlight_options(form):
+    # Batch mode reports every subject, so there is nothing to choose
+    if form.get('batch', '').lower() == 'true':
+        return None, None, False
+
+    # Get user input for subject and attendance type
+    subject = form.get('subject')
+    attendance_type = form.get('attendance_type')
+    highlight_last_column = 'highlight_last_column' in form and form['highlight_last_column'] == 'true'
+
+    if subject is None:
+        raise ValueError('Subject is required.')
+
+    # Clean subject input
+    subject = subject.strip().upper()
+
+    # Handle the case when "Total" is the subject
+    if subject == "TOTAL":
+        attendance_type = None  # Set attendance_type to None if subject is "Total"
+    else:
+        if attendance_type is None:
+            raise ValueError('Attendance type is required when subject is not "Total".')
+
+        attendance_type = attendance_type.strip().upper()
+
+    return subject, attendance_type, highlight_last_column
+
+def parse_rule_preset(form):
+    # Optional rules=<preset> form field (default, tiered); None means the configured rules
+    preset = form.get('rules', '').strip().lower()
+    if not preset:
+        return None
+    if preset not in RULE_PRESETS:
+        raise ValueError(f"Unknown highlight rules {preset!r}, expected one of {', '.join(RULE_PRESETS)}.")
+    return preset
+
+def load_upload_table(file_path, filename, file_hash, csv_folder, debug_images=False, progress=None, memory=None,
+                      pool=None):
+    # Parsed table, header index and page routes for an upload, from the cache when possible.
+    # memory (a MemoryTracker) enforces the per-job ceiling on memory growth during extraction;
+    # pool (a ProcessPoolExecutor) is shared with other uploads extracted at the same time.
+    # Only the compact table is cached. The sheet as extracted, every row included, is
+    # data.csv; on a cache miss the returned entry also carries it as 'table'.
+    import shutil
+    import pandas as pd
+    from attendance_table import (EmptyTableError, iter_workbook_rows, load_attendance_table, read_preamble,
+                                  table_from_rows)
+    from compact_table import CompactTable
+    from page_routing import stream_routed_rows
+
+    progress = progress or (lambda stage: None)
+
+    # Reuse the parsed table and its header index if these exact bytes were processed before
+    cached = table_cache.get(file_hash)
+    csv_path = os.path.join(csv_folder, 'data.csv')
+    if cached is not None:
+        csv_path = os.path.join(csv_folder, os.path.basename(cached['csv_path']))
+        if not os.path.exists(csv_path) and os.path.exists(cached['csv_path']):
+            # The same bytes were uploaded under another name; reuse that workspace's rows
+            with atomic_write(csv_path) as tmp_path:
+                shutil.copyfile(cached['csv_path'], tmp_path)
+        elif not os.path.exists(csv_path):
+            # The extracted rows are gone, read the document again
+            cached, csv_path = None, os.path.join(csv_folder, 'data.csv')
+    cache_hit = cached is not None
+
+    if not cache_hit:
+        progress('extracting')
+        df, preamble, pages = None, None, None
+        # Process based on file type
+        if filename.endswith('.pdf'):
+            # Pages are routed to pdfplumber or OCR individually
+            rows = None
+            try:
+                # Opens the document and classifies its pages; rows are read lazily below
+                rows, pages = stream_routed_rows(file_path, image_folder=csv_folder if debug_images else None,
+                                                 memory=memory, pool=pool)
+            except MemoryLimitExceeded:
+                raise
+            except Exception:
+                # The document could not be opened at all, OCR every page
+                logger.warning("Could not open %s, falling back to OCR", file_path, exc_info=True)
+                progress('ocr')
+                with timed_span('ocr_fallback'):
+                    csv_path = extract_data_from_image_pdf(file_path, csv_folder, debug_images=debug_images,
+                                                           pool=pool)
+                pages = {'text': 0, 'ocr': 'all'}
+
+            # Errors while reading pages are reported as they are, never retried with OCR
+            if rows is not None:
+                with timed_span('extraction'):
+                    if STREAM_EXTRACTION:
+                        # Rows flow from extraction straight into the table and data.csv, no CSV round trip
+                        try:
+                            with atomic_write(csv_path) as tmp_path, open(tmp_path, 'w', newline='') as csv_file:
+                                df, preamble = table_from_rows(written_rows(rows, csv.writer(csv_file)))
+                        except EmptyTableError:
+                            raise ValueError(NO_TABLE_MESSAGE)
+                    else:
+                        csv_path = write_rows_csv(rows, csv_folder)
+        elif STREAM_EXTRACTION:
+            # Workbook rows are read once, in read-only mode, straight into the table
+            with timed_span('extraction'), atomic_write(csv_path) as tmp_path:
+                with open(tmp_path, 'w', newline='') as csv_file:
+                    df, preamble = table_from_rows(written_rows(iter_workbook_rows(file_path), csv.writer(csv_file)))
+            logger.info("Read Excel rows into the table: %s", file_path)
+        else:
+            # Directly handle Excel files
+            with timed_span('extraction'):
+                excel_df = pd.read_excel(file_path)
+                with atomic_write(csv_path) as tmp_path:
+                    excel_df.to_csv(tmp_path, index=False)
+            logger.info("Converted Excel to CSV: %s", csv_path)  # Log the conversion
+
+        if df is None:
+            with timed_span('dataframe_load'):
+                df = load_attendance_table(csv_path)
+                preamble = read_preamble(csv_path)
+        ROWS.inc(len(df))
+        schema = SheetSchema.from_table(df)
+        # Typed, compact copy every analysis reads
+        with timed_span('normalize'):
+            compact = CompactTable.from_table(df, schema)
+        footprint = compact.footprint(df)
+        logger.info("Parsed table holds %d bytes, %d as a compact table", footprint['raw_bytes'],
+                    footprint['compact_bytes'])
+        cached = {'schema': schema, 'compact': compact, 'table_memory': footprint, 'pages': pages,
+                  'preamble': preamble, 'csv_path': csv_path}
+        table_cache.put(file_hash, cached)
+        cached = dict(cached, table=df)
+
+    return cached, cache_hit, csv_path
+
+def load_workspace_table(workspace):
+    # Parsed table of an already uploaded document, which any worker can rebuild
+    # from the upload kept in the workspace; None if there is no such upload
+    document = artifact_index.get_document(workspace)
+    # Workspaces created before the index existed still have their upload on disk
+    file_path = document['upload_path'] if document else find_upload(UPLOAD_FOLDER, workspace)
+    if file_path is None or not os.path.exists(file_path):
+        return None
+    if document:
+        file_hash = document['file_hash']
+    else:
+        with open(file_path, 'rb') as upload:
+            file_hash = hash_file_bytes(upload.read())
+    csv_folder = os.path.join(CSV_BASE_FOLDER, workspace)
+    os.makedirs(csv_folder, exist_ok=True)
+    cached, _, _ = load_upload_table(file_path, os.path.basename(file_path), file_hash, csv_folder)
+    if document is None:
+        artifact_index.record_document(workspace, os.path.basename(file_path), file_hash, file_path, cached['pages'])
+    return cached
+
+def process_upload(file_path, filename, file_hash, subject, attendance_type, highlight_last_column=False,
+                   debug_images=False, rule_preset=None, progress=None, subject_reports=False):
+    result, _ = _process_upload(file_path, filename, file_hash, subject, attendance_type, highlight_last_column,
+                                debug_images, rule_preset, progress, subject_reports)
+    return result
+
+def _process_upload(file_path, filename, file_hash, subject, attendance_type, highlight_last_column=False,
+                    debug_images=False, rule_preset=None, progress=None, subject_reports=False, pool=None):
+    # process_upload, also handing back the cached table so callers never parse it again
+    from batch_report import write_batch_report
+
+    progress = progress or (lambda stage: None)
+    rules = RULE_PRESETS[rule_preset] if rule_preset else load_rules()
+
+    # Create necessary folders for processing
+    workspace = workspace_name(filename, file_hash)
+    results_folder, csv_folder, excel_folder = create_folders_for_file(workspace)
+
+    # Memory this job adds; extraction stops with MemoryLimitExceeded (413) once it grows past the ceiling
+    memory = MemoryTracker()
+    cached, cache_hit, csv_path = load_upload_table(file_path, filename, file_hash, csv_folder, debug_images, progress,
+                                                    memory=memory, pool=pool)
+    schema, compact, pages = cached['schema'], cached['compact'], cached['pages']
+    artifact_index.record_document(workspace, filename, file_hash, file_path, pages)
+    if os.path.exists(csv_path):
+        artifact_index.record_artifact(workspace, csv_path)
+    with timed_span('store_sheet'):
+        attendance_store.store_sheet(workspace, filename, file_hash, compact, schema, cached['preamble'])
+
+    # Log the subject, attendance type, and CSV path
+    logger.info("Subject: %s, Attendance Type: %s, CSV Path: %s", subject, attendance_type, csv_path)
+    logger.info("Table cache %s: %s", 'hit' if cache_hit else 'miss', file_hash)
+
+    progress('highlighting')
+    if subject is None:
+        # Batch mode: one workbook with a sheet per subject/type plus TOTAL
+        highlighted_excel, sheets = write_batch_report(compact, excel_folder, schema, rules=rules)
+        result = {'csv_file': 'data.csv', 'highlighted_excel': highlighted_excel, 'sheets': sheets,
+                  'workspace': workspace, 'cache_hit': cache_hit, 'pages': pages}
+    else:
+        # Highlight attendance data, on the sheet as extracted
+        df = cached.get('table')
+        if df is None:
+            from attendance_table import load_attendance_table
+            with timed_span('dataframe_load'):
+                df = load_attendance_table(csv_path)
+        highlighted_excel = highlight_attendance(df, excel_folder, subject, attendance_type, highlight_last_column,
+                                                 schema, rules=rules)
+        result = {'csv_file': 'data.csv', 'highlighted_excel': highlighted_excel, 'workspace': workspace,
+                  'cache_hit': cache_hit, 'pages': pages}
+    artifact_index.record_artifact(workspace, highlighted_excel)
+
+    if subject_reports:
+        # A PDF and a workbook per subject, rendered in parallel from the same parsed table
+        progress('rendering')
+        result['subject_reports'] = render_subject_reports(compact, schema, workspace, results_folder, excel_folder,
+                                                           rules)
+
+    memory.sample(enforce=False)
+    result['memory'] = memory.to_dict()
+    result['table_memory'] = cached['table_memory']
+    return result, cached
+
+def render_subject_reports(df, schema, workspace, results_folder, excel_folder, rules):
+    from subject_reports import write_subject_reports
+
+    reports = write_subject_reports(df, results_folder, excel_folder, schema, rules)
+    for report in reports:
+        artifact_index.record_artifact(workspace, report['pdf'])
+        artifact_index.record_artifact(workspace, report['excel'])
+    return [{'subject': report['subject'],
+             'pdf': f"/download/{workspace}/{os.path.basename(report['pdf'])}",
+             'excel': f"/download/{workspace}/{os.path.basename(report['excel'])}"} for report in reports]
+
+def ingest_snapshot(file_path, filename, file_hash, threshold=ATTENDANCE_THRESHOLD, rule_preset=None, progress=None):
+    # Incremental mode for cumulative snapshots: compare with the previous snapshot of
+    # the same section, keep only the rows that changed, and rewrite only the workbook
+    # sheets of the blocks where a student crossed the threshold, joined or left
+    from batch_report import update_batch_report, write_batch_report, BATCH_REPORT_NAME
+    from excel_writer import write_highlighted_workbook
+    from snapshot_diff import affected_blocks, change_summary, diff_records
+
+    progress = progress or (lambda stage: None)
+    rules = RULE_PRESETS[rule_preset] if rule_preset else load_rules()
+
+    workspace = workspace_name(filename, file_hash)
+    results_folder, csv_folder, excel_folder = create_folders_for_file(workspace)
+    memory = MemoryTracker()
+    cached, cache_hit, _ = load_upload_table(file_path, filename, file_hash, csv_folder, progress=progress, memory=memory)
+    compact, schema = cached['compact'], cached['schema']
+    artifact_index.record_document(workspace, filename, file_hash, file_path, cached['pages'])
+    with timed_span('store_sheet'):
+        attendance_store.store_sheet(workspace, filename, file_hash, compact, schema, cached['preamble'])
+
+    sheet = attendance_store.get_sheet(workspace)
+    previous = attendance_store.previous_snapshot(workspace)
+    result = {'workspace': workspace, 'section': sheet['section'], 'sheet_date': sheet['sheet_date'],
+              'cache_hit': cache_hit, 'previous_workspace': previous['workspace'] if previous else None,
+              'memory': memory.to_dict(), 'table_memory': cached['table_memory']}
+
+    progress('highlighting')
+    if previous is None:
+        # First snapshot of this section, everything is new
+        highlighted_excel, _ = write_batch_report(compact, excel_folder, schema, rules=rules)
+        artifact_index.record_artifact(workspace, highlighted_excel)
+        return dict(result, mode='full', highlighted_excel=highlighted_excel)
+
+    with timed_span('snapshot_diff'):
+        changes = diff_records(attendance_store.records(previous['workspace']),
+                               attendance_store.records(workspace), threshold)
+        attendance_store.store_changes(workspace, previous['workspace'], changes)
+    affected = affected_blocks(changes)
+    result.update(mode='incremental', summary=change_summary(changes),
+                  affected=[subject if kind == subject else f'{subject} {kind}' for subject, kind in affected],
+                  changes_url=f'/ingest/{workspace}/changes')
+
+    if len(changes):
+        changes_excel = os.path.join(excel_folder, CHANGES_REPORT_NAME)
+        write_highlighted_workbook(changes, changes_excel, ['percentage'], rules=rules_for(rules))
+        artifact_index.record_artifact(workspace, changes_excel)
+        result['changes_excel'] = changes_excel
+
+    previous_report = artifact_index.find_artifact(BATCH_REPORT_NAME, previous['workspace'])
+    if previous_report is not None and os.path.exists(previous_report['path']):
+        # Unaffected sheets keep their highlights and only get this snapshot's counts
+        highlighted_excel, rewritten = update_batch_report(compact, previous_report['path'], excel_folder,
+                                                           affected, schema, rules=rules)
+    else:
+        highlighted_excel, rewritten = write_batch_report(compact, excel_folder, schema, rules=rules)
+    artifact_index.record_artifact(workspace, highlighted_excel)
+    return dict(result, highlighted_excel=highlighted_excel, rewritten_sheets=rewritten)
+
+def process_bulk(uploads, subject, attendance_type, highlight_last_column=False, rule_preset=None, progress=None):
+    # Several saved uploads (file_path, filename, file_hash, source) processed concurrently
+    # through process_upload, then merged into one workbook across all of them. source is
+    # the sheet's path inside its ZIP archive, or its file name.
+    from concurrent.futures import ProcessPoolExecutor
+    from batch_report import write_merged_report
+    from pdf_extract import PDF_EXTRACT_WORKERS
+
+    progress = progress or (lambda stage: None)
+    rules = RULE_PRESETS[rule_preset] if rule_preset else load_rules()
+
+    progress('processing')
+    # Files run on threads, their pages on one process pool, so the process count stays
+    # at PDF_EXTRACT_WORKERS however many files are in flight
+    with ProcessPoolExecutor(max_workers=PDF_EXTRACT_WORKERS) as pool:
+        outcomes = run_concurrently(
+            lambda upload: _process_upload(*upload[:3], subject, attendance_type, highlight_last_column,
+                                           rule_preset=rule_preset, pool=pool), uploads)
+
+    files, tables, labels = [], [], set()
+    for (file_path, filename, file_hash, source), (outcome, error) in zip(uploads, outcomes):
+        if error is not None:
+            logger.warning("Bulk upload of %s failed: %s", filename, error)
+            files.append({'filename': filename, 'status': FAILED, 'error': str(error)})
+            continue
+        # The table each upload was processed from, even if the cache has evicted it since
+        result, cached = outcome
+        files.append(dict(result, filename=filename, status=DONE))
+        sheet = attendance_store.get_sheet(result['workspace'])
+        # Sections name the rows in the merged workbook; source paths when sections repeat or are missing
+        label = f"Section {sheet['section']}" if sheet and sheet['section'] else os.path.splitext(source)[0]
+        label = label if label not in labels else os.path.splitext(source)[0]
+        # Sheets at the same path in two archives still get rows of their own
+        base, copy = label, 2
+        while label in labels:
+            label, copy = f'{base} ({copy})', copy + 1
+        labels.add(label)
+        tables.append((label, cached['compact'], cached['schema']))
+
+    summary = {'files': files, 'succeeded': len(tables), 'failed': len(files) - len(tables)}
+    if not tables:
+        return summary
+
+    progress('merging')
+    bulk_hash = hash_file_bytes(''.join(sorted(upload[2] for upload in uploads)).encode())
+    workspace = f'bulk-{bulk_hash[:16]}'
+    excel_folder = os.path.join(EXCEL_BASE_FOLDER, workspace)
+    os.makedirs(excel_folder, exist_ok=True)
+    merged_excel, sheets = write_merged_report(tables, excel_folder, rules=rules)
+    artifact_index.record_artifact(workspace, merged_excel)
+    return dict(summary, workspace=workspace, merged_excel=merged_excel, sheets=sheets)
+
+def send_artifact(folder, filename, workspace=None):
+    # send_from_directory with a strong ETag taken from the content hash, so clients get
+    # 304 on If-None-Match and 206 on Range (werkzeug's conditional responses). Text
+    # exports are also served from a pre-compressed .gz copy when the client accepts gzip.
+    path = safe_join(folder, filename)
+    if path is None or not os.path.isfile(path):
+        raise NotFound()
+    etag = artifact_index.content_hash(path, workspace)
+
+    if (path.endswith(GZIP_EXTENSIONS) and request.accept_encodings['gzip'] > 0
+            and 'Range' not in request.headers):
+        response = send_file(gzip_variant(path), mimetype=mimetypes.guess_type(path)[0],
+                             download_name=filename, etag=f'{etag}-gzip', conditional=True)
+        response.headers['Content-Encoding'] = 'gzip'
+    else:
+        response = send_file(path, download_name=filename, etag=etag, conditional=True)
+    response.vary.add('Accept-Encoding')
+    response.cache_control.no_cache = True  # Always revalidate; unchanged files cost a 304
+    return response
+
+@bp.before_app_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@bp.after_app_request
+def record_request_metrics(response):
+    # Latency and count per endpoint; unknown URLs are grouped so label values stay bounded
+    endpoint = request.endpoint or 'not_found'
+    if hasattr(g, 'request_started'):
+        REQUEST_SECONDS.observe(time.perf_counter() - g.request_started, endpoint=endpoint)
+    REQUESTS.inc(endpoint=endpoint, status=response.status_code)
+    return response
+
+@bp.route('/upload', methods=['POST'])
 def upload_file():
     if 'file' not in request.files:
         return jsonify({'error': 'No file part'}), 400
@@ -158,78 +559,351 @@ def upload_file():
         return jsonify({'error': 'No selected file'}), 400
     
     filename = secure_filename(file.filename)
-    file_path = os.path.join(UPLOAD_FOLDER, filename)
-    file.save(file_path)
-    print(f"File uploaded: {file_path}")  # Log the upload
+    if not filename.endswith(('.pdf', '.xlsx', '.xls')):
+        return jsonify({'error': 'Unsupported file format'}), 400
 
     try:
-        # Create necessary folders for processing
-        results_folder, csv_folder, excel_folder = create_folders_for_file(filename)
-        
-        # Process based on file type
-        if filename.endswith('.pdf'):
-            # Use pdfplumber to check if it's a text-based or image-based PDF
-            try:
-                csv_path = extract_data_from_pdf(file_path, csv_folder)
-            except Exception:
-                csv_path = extract_data_from_image_pdf(file_path, csv_folder)
-        
-        elif filename.endswith('.xlsx') or filename.endswith('.xls'):
-            # Directly handle Excel files
-            df = pd.read_excel(file_path)
-            csv_path = os.path.join(csv_folder, 'data.csv')
-            df.to_csv(csv_path, index=False)
-            print(f"Converted Excel to CSV: {csv_path}")  # Log the conversion
+        subject, attendance_type, highlight_last_column = parse_highlight_options(request.form)
+        rule_preset = parse_rule_preset(request.form)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
 
-        else:
-            return jsonify({'error': 'Unsupported file format'}), 400
+    file_bytes = file.read()
+    file_hash = hash_file_bytes(file_bytes)
+    # Saved atomically under uploads/<workspace>/, so same-named uploads never overwrite each other
+    with timed_span('upload_save'):
+        file_path = save_upload(UPLOAD_FOLDER, workspace_name(filename, file_hash), filename, file_bytes)
+    logger.info("File uploaded: %s", file_path)  # Log the upload
+
+    # Page images from OCR are only kept when explicitly asked for
+    debug_images = request.form.get('debug_images', '').lower() == 'true'
+    # subject_reports=true also renders a PDF and a workbook per subject
+    subject_reports = request.form.get('subject_reports', '').lower() == 'true'
+
+    # Async mode: hand the file to a background worker and let the client poll /jobs/<id>
+    if request.form.get('async', request.args.get('async', '')).lower() == 'true':
+        try:
+            job = job_queue.submit(process_upload, file_path, filename, file_hash,
+                                   subject, attendance_type, highlight_last_column, debug_images, rule_preset,
+                                   subject_reports=subject_reports)
+        except QueueFullError as e:
+            return jsonify({'error': str(e)}), 503
+        return jsonify({'job_id': job.id, 'status': job.status,
+                        'status_url': f'/jobs/{job.id}', 'result_url': f'/jobs/{job.id}/result'}), 202
+
+    try:
+        result = process_upload(file_path, filename, file_hash, subject, attendance_type, highlight_last_column,
+                                debug_images, rule_preset, subject_reports=subject_reports)
+        return jsonify(result), 200
 
-        # Get user input for subject and attendance type
-        subject = request.form.get('subject')
-        attendance_type = request.form.get('attendance_type')
-        highlight_last_column = 'highlight_last_column' in request.form and request.form['highlight_last_column'] == 'true'
+    except ValueError as e:
+        logger.warning("ValueError: %s", e)  # Log ValueError
+        return jsonify({'error': str(e)}), 400
+    except MemoryLimitExceeded as e:
+        logger.warning("Memory limit: %s", e)
+        return jsonify({'error': str(e)}), e.status_code
+    except Exception as e:
+        logger.exception("Exception: %s", e)  # Log generic Exception
+        return jsonify({'error': str(e)}), 500
 
-        # Clean subject input
-        subject = subject.strip().upper()
 
-        # Handle the case when "Total" is the subject
-        if subject == "TOTAL":
-            attendance_type = None  # Set attendance_type to None if subject is "Total"
-        else:
-            if attendance_type is None:
-                return jsonify({'error': 'Attendance type is required when subject is not "Total".'}), 400
-            
-            attendance_type = attendance_type.strip().upper()
+@bp.route('/upload/bulk', methods=['POST'])
+def upload_bulk():
+    # Several sheets (repeated 'files' fields and/or ZIP archives) in one request,
+    # processed concurrently. Same options as /upload; batch=true is the default.
+    files = request.files.getlist('files') + request.files.getlist('file')
+    if not files:
+        return jsonify({'error': 'No file part'}), 400
+    try:
+        form = request.form if 'subject' in request.form else dict(request.form, batch='true')
+        subject, attendance_type, highlight_last_column = parse_highlight_options(form)
+        rule_preset = parse_rule_preset(request.form)
+        entries = expand_uploads(files)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
 
-        # Log the subject, attendance type, and CSV path
-        print(f"Subject: {subject}")
-        print(f"Attendance Type: {attendance_type}")
-        print(f"CSV Path: {csv_path}")
+    uploads = []
+    with timed_span('upload_save'):
+        for filename, source, file_bytes in entries:
+            file_hash = hash_file_bytes(file_bytes)
+            file_path = save_upload(UPLOAD_FOLDER, workspace_name(filename, file_hash), filename, file_bytes)
+            uploads.append((file_path, filename, file_hash, source))
+    logger.info("Bulk upload of %d sheets", len(uploads))
+
+    if request.form.get('async', request.args.get('async', '')).lower() == 'true':
+        try:
+            job = job_queue.submit(process_bulk, uploads, subject, attendance_type, highlight_last_column,
+                                   rule_preset)
+        except QueueFullError as e:
+            return jsonify({'error': str(e)}), 503
+        return jsonify({'job_id': job.id, 'status': job.status,
+                        'status_url': f'/jobs/{job.id}', 'result_url': f'/jobs/{job.id}/result'}), 202
 
-        # Highlight attendance data
-        highlighted_excel = highlight_attendance(csv_path, excel_folder, subject, attendance_type, highlight_last_column)
+    try:
+        result = process_bulk(uploads, subject, attendance_type, highlight_last_column, rule_preset)
+    except Exception as e:
+        logger.exception("Exception: %s", e)
+        return jsonify({'error': str(e)}), 500
+    return jsonify(result), 200 if result['succeeded'] else 400
 
-        return jsonify({'csv_file': 'data.csv', 'highlighted_excel': highlighted_excel}), 200
 
+@bp.route('/ingest', methods=['POST'])
+def ingest_file():
+    # Snapshot ingest: like /upload in batch mode, but reports what changed since the
+    # previous snapshot of the same section
+    if 'file' not in request.files or request.files['file'].filename == '':
+        return jsonify({'error': 'No file part'}), 400
+    filename = secure_filename(request.files['file'].filename)
+    if not filename.endswith(('.pdf', '.xlsx', '.xls')):
+        return jsonify({'error': 'Unsupported file format'}), 400
+    try:
+        threshold = float(request.form.get('threshold', ATTENDANCE_THRESHOLD))
+        rule_preset = parse_rule_preset(request.form)
     except ValueError as e:
-        print(f"ValueError: {str(e)}")  # Log ValueErrorx
         return jsonify({'error': str(e)}), 400
+
+    file_bytes = request.files['file'].read()
+    file_hash = hash_file_bytes(file_bytes)
+    with timed_span('upload_save'):
+        file_path = save_upload(UPLOAD_FOLDER, workspace_name(filename, file_hash), filename, file_bytes)
+
+    if request.form.get('async', request.args.get('async', '')).lower() == 'true':
+        try:
+            job = job_queue.submit(ingest_snapshot, file_path, filename, file_hash, threshold, rule_preset)
+        except QueueFullError as e:
+            return jsonify({'error': str(e)}), 503
+        return jsonify({'job_id': job.id, 'status': job.status,
+                        'status_url': f'/jobs/{job.id}', 'result_url': f'/jobs/{job.id}/result'}), 202
+
+    try:
+        return jsonify(ingest_snapshot(file_path, filename, file_hash, threshold, rule_preset)), 200
+    except ValueError as e:
+        logger.warning("ValueError: %s", e)
+        return jsonify({'error': str(e)}), 400
+    except MemoryLimitExceeded as e:
+        logger.warning("Memory limit: %s", e)
+        return jsonify({'error': str(e)}), e.status_code
     except Exception as e:
-        print(f"Exception: {str(e)}")  # Log generic Exception
+        logger.exception("Exception: %s", e)
         return jsonify({'error': str(e)}), 500
 
 
-@app.route('/download/<filename>')
+@bp.route('/ingest/<workspace>/changes')
+def snapshot_changes(workspace):
+    workspace = secure_filename(workspace)
+    if attendance_store.get_sheet(workspace) is None:
+        return jsonify({'error': 'Snapshot not found'}), 404
+    changes = attendance_store.changes(workspace, request.args.get('change'))
+    return jsonify({'workspace': workspace, 'count': len(changes), 'changes': changes}), 200
+
+
+@bp.route('/jobs/<job_id>')
+def job_status(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job.to_dict()), 200
+
+
+@bp.route('/jobs/<job_id>/result')
+def job_result(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    if job.status == FAILED:
+        return jsonify({'error': job.error, 'job_id': job.id}), job.error_code
+    if job.status != DONE:
+        # Not finished yet, tell the client to keep polling
+        return jsonify(job.to_dict()), 202
+    return jsonify(dict(job.result, job_id=job.id)), 200
+
+
+@bp.route('/cache/stats')
+def cache_stats():
+    return jsonify(table_cache.stats()), 200
+
+
+@bp.route('/metrics')
+def metrics():
+    # Cache and job counters live in their own objects and are read at scrape time
+    cache = table_cache.stats()
+    jobs = job_queue.stats()
+    extra = []
+    extra += render_gauge('attendance_table_cache_hits_total', 'Table cache hits.', cache['hits'], 'counter')
+    extra += render_gauge('attendance_table_cache_misses_total', 'Table cache misses.', cache['misses'], 'counter')
+    extra += render_gauge('attendance_table_cache_evictions_total', 'Table cache evictions.', cache['evictions'], 'counter')
+    extra += render_gauge('attendance_table_cache_bytes', 'Bytes held by the table cache.', cache['size_bytes'])
+    extra += render_gauge('attendance_jobs_queued', 'Async jobs waiting for a worker.', jobs['queued'])
+    extra += render_gauge('attendance_jobs_running', 'Async jobs being processed.', jobs['running'])
+    return Response(render_metrics(extra), mimetype='text/plain; version=0.0.4')
+
+
+@bp.route('/documents')
+def list_documents():
+    # Processed documents, most recent first, straight from the artifact index
+    try:
+        limit = min(int(request.args.get('limit', 50)), 500)
+        offset = int(request.args.get('offset', 0))
+    except ValueError:
+        return jsonify({'error': 'limit and offset must be integers'}), 400
+    documents, total = artifact_index.list_documents(limit, offset)
+    return jsonify({'documents': documents, 'total': total, 'limit': limit, 'offset': offset}), 200
+
+
+@bp.route('/documents/<workspace>')
+def document_details(workspace):
+    document = artifact_index.get_document(secure_filename(workspace))
+    if document is None:
+        return jsonify({'error': 'Document not found'}), 404
+    return jsonify(document), 200
+
+
+@bp.route('/api/defaulters', methods=['GET', 'POST'])
+def api_defaulters():
+    # Students below threshold as JSON (or NDJSON with format=ndjson), computed from
+    # the parsed table without writing a workbook. The sheet is either an uploaded
+    # 'file' or the workspace of an earlier upload in 'doc'.
+    from defaulters import find_defaulters, defaulter_records, iter_ndjson
+
+    try:
+        subject, attendance_type, _ = parse_highlight_options(request.values)
+        if subject is None:
+            raise ValueError('Subject is required.')
+        threshold = float(request.values.get('threshold', ATTENDANCE_THRESHOLD))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    if 'file' in request.files and request.files['file'].filename:
+        filename = secure_filename(request.files['file'].filename)
+        if not filename.endswith(('.pdf', '.xlsx', '.xls')):
+            return jsonify({'error': 'Unsupported file format'}), 400
+        file_bytes = request.files['file'].read()
+        file_hash = hash_file_bytes(file_bytes)
+        workspace = workspace_name(filename, file_hash)
+        file_path = save_upload(UPLOAD_FOLDER, workspace, filename, file_bytes)
+        _, csv_folder, _ = create_folders_for_file(workspace)
+    elif request.values.get('doc'):
+        workspace = secure_filename(request.values['doc'])
+    else:
+        return jsonify({'error': 'Send a file or the doc (workspace) of an earlier upload.'}), 400
+
+    # The table is parsed here unless cached, so extraction errors are reported like /upload does
+    try:
+        if 'file' in request.files and request.files['file'].filename:
+            cached, _, _ = load_upload_table(file_path, filename, file_hash, csv_folder, memory=MemoryTracker())
+            artifact_index.record_document(workspace, filename, file_hash, file_path, cached['pages'])
+        else:
+            cached = load_workspace_table(workspace)
+            if cached is None:
+                return jsonify({'error': 'Document not found. Upload the file again.'}), 404
+    except ValueError as e:
+        logger.warning("ValueError: %s", e)
+        return jsonify({'error': str(e)}), 400
+    except MemoryLimitExceeded as e:
+        logger.warning("Memory limit: %s", e)
+        return jsonify({'error': str(e)}), e.status_code
+
+    try:
+        with timed_span('defaulters'):
+            frame = find_defaulters(cached['compact'], subject, attendance_type, threshold, cached['schema'])
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    if request.values.get('format', '').lower() == 'ndjson':
+        return Response(iter_ndjson(frame), mimetype='application/x-ndjson')
+    return jsonify({'workspace': workspace, 'subject': subject, 'attendance_type': attendance_type,
+                    'threshold': threshold, 'count': len(frame), 'defaulters': defaulter_records(frame)}), 200
+
+
+@bp.route('/attendance/sheets')
+def stored_sheets():
+    return jsonify({'sheets': attendance_store.list_sheets()}), 200
+
+
+@bp.route('/attendance')
+def query_attendance():
+    # Cross-upload query over every stored sheet, e.g. ?below=60 for every student
+    # under 60% in any subject, optionally narrowed by subject, type and section
+    try:
+        below = request.args.get('below')
+        below = float(below) if below is not None else None
+        limit = min(int(request.args.get('limit', QUERY_ROW_LIMIT)), QUERY_ROW_LIMIT)
+    except ValueError:
+        return jsonify({'error': 'below and limit must be numbers'}), 400
+    records = attendance_store.query(enrollment=request.args.get('enrollment'), subject=request.args.get('subject'),
+                                     attendance_type=request.args.get('type'), section=request.args.get('section'),
+                                     below=below, limit=limit)
+    enrollments = sorted({record['enrollment'] for record in records})
+    return jsonify({'records': records, 'enrollments': enrollments, 'count': len(records)}), 200
+
+
+@bp.route('/attendance/students/<enrollment>')
+def student_attendance(enrollment):
+    records = attendance_store.query(enrollment=enrollment)
+    if not records:
+        return jsonify({'error': 'Enrollment number not found'}), 404
+    return jsonify({'enrollment': records[0]['enrollment'], 'name': records[0]['name'], 'records': records}), 200
+
+
+@bp.route('/download/csv')
+def download_latest_csv():
+    # CSV of the most recently processed document
+    document = artifact_index.latest_document()
+    if document is None:
+        return jsonify({'error': 'No CSV generated yet. Please upload and process a file first.'}), 404
+    return download_csv(document['workspace'])
+
+
+@bp.route('/download/csv/<workspace>')
+def download_csv(workspace):
+    workspace = secure_filename(workspace)
+    csv_folder = os.path.join(CSV_BASE_FOLDER, workspace)
+    csv_path = os.path.join(csv_folder, 'data.csv')
+
+    if not os.path.exists(csv_path):
+        # Removed since the upload; reading the upload again writes it back
+        if load_workspace_table(workspace) is None or not os.path.exists(csv_path):
+            return jsonify({'error': 'CSV file not found. Upload the file again.'}), 404
+        logger.info("Extracted CSV again: %s", csv_path)
+    if artifact_index.find_artifact('data.csv', workspace) is None:
+        artifact_index.record_artifact(workspace, csv_path)
+
+    return send_artifact(csv_folder, 'data.csv', workspace)
+
+
+@bp.route('/download/<workspace>/<filename>')
+def download_workspace_file(workspace, filename):
+    workspace = secure_filename(workspace)
+    safe_filename = os.path.basename(filename)
+    if filename.endswith('.pdf'):
+        return send_artifact(os.path.join(RESULTS_BASE_FOLDER, workspace), safe_filename, workspace)
+    elif filename.endswith('.xlsx'):
+        return send_artifact(os.path.join(EXCEL_BASE_FOLDER, workspace), safe_filename, workspace)
+    return jsonify({'error': 'File not found'}), 404
+
+
+@bp.route('/download/<filename>')
 def download_file(filename):
     safe_filename = os.path.basename(filename)
+    # Without a workspace the name must identify one document; report names like
+    # attendance_report.xlsx repeat across uploads, and guessing would serve another sheet
+    artifacts = artifact_index.find_artifacts(safe_filename)
+    if len({artifact['workspace'] for artifact in artifacts}) > 1:
+        return jsonify({'error': 'Several documents have a file with this name. '
+                                 'Download it from /download/<workspace>/<filename>.'}), 404
+    if artifacts:
+        artifact = artifacts[0]
+        if os.path.exists(artifact['path']):
+            return send_artifact(os.path.dirname(artifact['path']), safe_filename, artifact['workspace'])
+        artifact_index.forget_artifact(artifact['workspace'], safe_filename)
     base_name = os.path.splitext(filename)[0]
     if filename.endswith('.pdf'):
         results_folder = os.path.join(RESULTS_BASE_FOLDER, base_name)
-        return send_from_directory(results_folder, safe_filename)
+        return send_artifact(results_folder, safe_filename)
     elif filename.endswith('.xlsx'):
         excel_folder = os.path.join(EXCEL_BASE_FOLDER, base_name)
-        return send_from_directory(excel_folder, safe_filename)
+        return send_artifact(excel_folder, safe_filename)
     return jsonify({'error': 'File not found'}), 404
 
 if __name__ == '__main__':
-    app.run(debug=True)
+    create_app().run(debug=True)
@@ -0,0 +1,170 @@
+import logging
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+from werkzeug.utils import secure_filename
+
+from batch_report import build_report_frames
+from excel_writer import write_highlighted_sheets
+from highlight_rules import load_rules, rule_masks, rules_for
+from metrics import timed_span
+
+logger = logging.getLogger(__name__)
+
+# Worker processes rendering reports; reportlab and openpyxl are pure Python and hold
+# the GIL, so reports only render side by side in separate processes
+SUBJECT_REPORT_WORKERS = int(os.environ.get('SUBJECT_REPORT_WORKERS', '0') or 0) or os.cpu_count() or 1
+# Rows per table flowable. reportlab re-measures a table every time it splits it over
+# a page, so long tables are cut into chunks that each repeat the header row.
+REPORT_ROWS_PER_TABLE = 200
+# Sheets with fewer students render every report in this process
+PARALLEL_MIN_ROWS = 500
+ID_COLUMN_WIDTH_MM = (12, 30, 55)
+COUNT_COLUMN_WIDTH_MM = 22
+
+
+def subject_frames(df, schema=None):
+    # One frame per subject with its TH and LAB blocks side by side after the student
+    # columns (the layout the old per-subject reports used), plus TOTAL, as
+    # (subject, frame, [(percentage column, type)]) entries
+    import pandas as pd
+
+    grouped = {}  # subject -> (ids, [count frames], [(percentage column, type)])
+    for _, frame, subject, kind in build_report_frames(df, schema):
+        ids, counts = frame.iloc[:, :3], frame.iloc[:, 3:]
+        prefix = f'{subject} {kind}' if kind else subject
+        counts = counts.set_axis([f'{prefix} {col}' for col in counts.columns], axis=1)
+        entry = grouped.setdefault(subject, (ids, [], []))
+        entry[1].append(counts)
+        entry[2].append((counts.columns[-1], kind))
+
+    return [(subject, pd.concat([ids] + counts, axis=1), percentages)
+            for subject, (ids, counts, percentages) in grouped.items()]
+
+
+def report_filename(subject, extension):
+    return secure_filename(f'{subject}_report{extension}')
+
+
+@lru_cache(maxsize=None)
+def _table_style():
+    # Built once per process and shared by every table of every report it renders
+    from reportlab.lib import colors
+    from reportlab.platypus import TableStyle
+
+    return TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('ALIGN', (2, 1), (2, -1), 'LEFT'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, -1), 7),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 6),
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
+        ('BOX', (0, 0), (-1, -1), 1, colors.black),
+    ])
+
+
+@lru_cache(maxsize=None)
+def _title_style():
+    from reportlab.lib.styles import getSampleStyleSheet
+
+    return getSampleStyleSheet()['Heading2']
+
+
+def _pdf_value(value):
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value).replace('\n', ' ')
+
+
+def render_subject_pdf(subject, frame, highlights, pdf_path):
+    # The subject's table as a PDF, split into paged table flowables with the header on
+    # every page. Cells matched by a highlight rule get that rule's colour, as in Excel.
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4, landscape
+    from reportlab.lib.units import mm
+    from reportlab.platypus import LongTable, Paragraph, SimpleDocTemplate
+
+    from workspace import atomic_write
+
+    # Count headers go one word per line so they fit the narrow columns
+    header = [str(col) if i < 3 else str(col).replace(' ', '\n') for i, col in enumerate(frame.columns)]
+    rows = [[_pdf_value(value) for value in row] for row in frame.itertuples(index=False, name=None)]
+    col_widths = [width * mm for width in ID_COLUMN_WIDTH_MM] + [COUNT_COLUMN_WIDTH_MM * mm] * (len(header) - 3)
+    # Fixed column widths spare reportlab from measuring every cell
+    page_size = A4 if sum(col_widths) < A4[0] - 20 * mm else landscape(A4)
+
+    # BACKGROUND commands for every highlighted cell, grouped by the chunk holding its
+    # row, from one mask per rule and column
+    fills = {}
+    for column, rules in highlights:
+        pos = frame.columns.get_loc(column)
+        for rule, mask in zip(rules, rule_masks(frame, pos, rules)):
+            color = colors.HexColor(f'#{rule.color}')
+            for row in mask.nonzero()[0]:
+                chunk, offset = divmod(int(row), REPORT_ROWS_PER_TABLE)
+                cell = (pos, offset + 1)  # +1 for the header row
+                fills.setdefault(chunk, []).append(('BACKGROUND', cell, cell, color))
+
+    elements = [Paragraph(f'{subject} attendance report', _title_style())]
+    for chunk, start in enumerate(range(0, max(len(rows), 1), REPORT_ROWS_PER_TABLE)):
+        table = LongTable([header] + rows[start:start + REPORT_ROWS_PER_TABLE], colWidths=col_widths, repeatRows=1)
+        table.setStyle(_table_style())
+        if chunk in fills:
+            table.setStyle(fills[chunk])
+        elements.append(table)
+
+    with atomic_write(pdf_path) as tmp_path:
+        doc = SimpleDocTemplate(tmp_path, pagesize=page_size, leftMargin=10 * mm, rightMargin=10 * mm,
+                                topMargin=10 * mm, bottomMargin=10 * mm, title=f'{subject} attendance report')
+        doc.build(elements)
+    return pdf_path
+
+
+def render_subject_excel(subject, frame, highlights, excel_path):
+    write_highlighted_sheets([(subject[:31], frame, [column for column, _ in highlights], dict(highlights))],
+                             excel_path)
+    return excel_path
+
+
+def _render(task):
+    # Runs inside a worker: one PDF or one workbook
+    render, subject, frame, highlights, path = task
+    return render(subject, frame, highlights, path)
+
+
+def write_subject_reports(df, results_folder, excel_folder, schema=None, rules=None, workers=None,
+                          min_rows=PARALLEL_MIN_ROWS):
+    # A PDF and a workbook per subject (plus TOTAL), all from one parsed table. Every
+    # report is an independent task on a process pool, so wall time follows the number
+    # of workers rather than the number of subjects. Returns one entry per subject.
+    rules = rules if rules is not None else load_rules()
+    workers = SUBJECT_REPORT_WORKERS if workers is None else workers
+
+    reports, tasks = [], []
+    for subject, frame, percentages in subject_frames(df, schema):
+        highlights = [(column, rules_for(rules, subject, kind)) for column, kind in percentages]
+        pdf_path = os.path.join(results_folder, report_filename(subject, '.pdf'))
+        excel_path = os.path.join(excel_folder, report_filename(subject, '.xlsx'))
+        tasks.append((render_subject_pdf, subject, frame, highlights, pdf_path))
+        tasks.append((render_subject_excel, subject, frame, highlights, excel_path))
+        reports.append({'subject': subject, 'pdf': pdf_path, 'excel': excel_path})
+    if len(reports) <= 1:
+        raise ValueError("No subject columns found in the sheet header.")
+
+    workers = min(workers, len(tasks)) if len(df) >= min_rows else 1
+    with timed_span('subject_reports'):
+        if workers <= 1:
+            for task in tasks:
+                _render(task)
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                list(pool.map(_render, tasks))
+    logger.info("Rendered %d subject reports with %d workers into %s and %s",
+                len(reports), workers, results_folder, excel_folder)
+    return reports
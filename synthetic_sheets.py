@@ -0,0 +1,119 @@
+import argparse
+import csv
+import random
+
+# Subject codes cycled (with a numeric suffix once exhausted) to build wide sheets
+SUBJECT_CODES = ['DBMS', 'CN', 'TOC', 'ASM', 'DT', 'SDL', 'OS', 'DSA', 'ECE', 'HU', 'ML', 'SE']
+
+
+def synthetic_subjects(count):
+    # Mix of TH+LAB, TH-only and LAB-only subjects, like the real SGSITS sheets
+    subjects = []
+    for i in range(count):
+        code = SUBJECT_CODES[i % len(SUBJECT_CODES)]
+        if i >= len(SUBJECT_CODES):
+            code = f'{code}{i // len(SUBJECT_CODES) + 1}'
+        kinds = [['TH', 'LAB'], ['TH'], ['LAB']][i % 3]
+        subjects.append((code, kinds))
+    return subjects
+
+
+def synthetic_rows(students=2000, subjects=24, seed=0):
+    # Rows in the same layout extraction produces for uploads/input.pdf: four title
+    # rows, a spacer, the subject header, the TH/LAB type row, then one row per student
+    rng = random.Random(seed)
+    subject_list = synthetic_subjects(subjects)
+    width = 3 + sum(3 * len(kinds) for _, kinds in subject_list) + 3
+
+    def title(text):
+        return [text] + [''] * (width - 1)
+
+    rows = [
+        title('SHRI G. S. INSTITUTE OF TECHNOLOGY & SCIENCE, INDORE'),
+        title('SESSION : July-December 2024; Semester "A"'),
+        title('III YEAR ATTENDANCE SHEET SECTION A(till 31/08/2024 )'),
+        title('Note: Please fill the attendance till 31/08/2024.'),
+        [''] * width,
+    ]
+
+    header, types = ['', '', ''], ['S. No.', 'Enrollment', 'Name']
+    for code, kinds in subject_list:
+        for n, kind in enumerate(kinds):
+            header += [code if n == 0 else '', '', '']
+            types += [kind, '', '']
+    rows.append(header + ['', '', ''])
+    rows.append(types + ['', '', ''])
+
+    for student in range(1, students + 1):
+        row = [str(student), f'0801CS22{student:04d}', f'STUDENT\nNUMBER {student}']
+        total_classes = total_present = 0
+        for _, kinds in subject_list:
+            for kind in kinds:
+                classes = rng.randint(15, 25) if kind == 'TH' else rng.randint(4, 8)
+                present = rng.randint(classes // 3, classes)
+                total_classes += classes
+                total_present += present
+                row += [str(classes), str(present), str(round(100 * present / classes))]
+        row += [str(total_classes), str(total_present), str(round(100 * total_present / total_classes))]
+        rows.append(row)
+    return rows
+
+
+def write_synthetic_csv(path, rows):
+    with open(path, 'w', newline='') as csv_file:
+        csv.writer(csv_file).writerows(rows)
+    return path
+
+
+def write_synthetic_xlsx(path, rows):
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet()
+    for row in rows:
+        # Numbers are stored as numbers, the way a spreadsheet export would
+        ws.append([int(value) if value.isdigit() else (value or None) for value in row])
+    wb.save(path)
+    return path
+
+
+def write_synthetic_pdf(path, rows):
+    # A ruled table split across landscape pages, so pdfplumber's extract_table finds
+    # one grid per page just like on the scanned-in institute sheets
+    from reportlab.lib import colors
+    from reportlab.lib.units import mm
+    from reportlab.platypus import LongTable, SimpleDocTemplate, TableStyle
+
+    # S. No., Enrollment and Name need room, so text never spills into the next cell
+    col_widths = [10 * mm, 24 * mm, 40 * mm] + [8 * mm] * (len(rows[0]) - 3)
+    page_size = (max(842, sum(col_widths) + 20 * mm), 595)
+    data = [[value.replace('\n', ' ') for value in row] for row in rows]
+
+    table = LongTable(data, colWidths=col_widths, repeatRows=0)
+    table.setStyle(TableStyle([
+        ('FONTSIZE', (0, 0), (-1, -1), 5),
+        ('GRID', (0, 0), (-1, -1), 0.25, colors.black),
+        ('SPAN', (0, 0), (-1, 0)), ('SPAN', (0, 1), (-1, 1)),
+        ('SPAN', (0, 2), (-1, 2)), ('SPAN', (0, 3), (-1, 3)),
+    ]))
+    doc = SimpleDocTemplate(path, pagesize=page_size, leftMargin=10 * mm, rightMargin=10 * mm,
+                            topMargin=10 * mm, bottomMargin=10 * mm)
+    doc.build([table])
+    return path
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Generate synthetic SGSITS-layout attendance sheets.')
+    parser.add_argument('output', help='Output path ending in .pdf, .xlsx or .csv')
+    parser.add_argument('--students', type=int, default=2000)
+    parser.add_argument('--subjects', type=int, default=24)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    sheet_rows = synthetic_rows(args.students, args.subjects, args.seed)
+    writers = {'.pdf': write_synthetic_pdf, '.xlsx': write_synthetic_xlsx, '.csv': write_synthetic_csv}
+    extension = args.output[args.output.rfind('.'):].lower()
+    if extension not in writers:
+        parser.error('output must end in .pdf, .xlsx or .csv')
+    writers[extension](args.output, sheet_rows)
+    print(f"Wrote {args.students} students x {args.subjects} subjects to {args.output}")
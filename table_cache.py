@@ -0,0 +1,73 @@
+import hashlib
+import pickle
+import threading
+import zlib
+from collections import OrderedDict
+
+# Default budget for the in-process cache of parsed attendance tables
+TABLE_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+
+def hash_file_bytes(data):
+    # Key uploads by their content so a re-upload under any filename hits the cache
+    return hashlib.sha256(data).hexdigest()
+
+
+class TableCache:
+    # LRU cache of parsed attendance tables keyed by the hash of the uploaded bytes.
+    # Entries are pickled and zlib-compressed, so the size bound counts the bytes
+    # actually held and every get() hands back a fresh copy the caller may mutate.
+
+    def __init__(self, max_bytes=TABLE_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            blob = self._entries.get(key)
+            if blob is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)  # Mark as most recently used
+            self.hits += 1
+        return pickle.loads(zlib.decompress(blob))
+
+    def put(self, key, table):
+        blob = zlib.compress(pickle.dumps(table, protocol=pickle.HIGHEST_PROTOCOL))
+        if len(blob) > self.max_bytes:
+            return False  # Never let a single oversized sheet flush the whole cache
+
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= len(previous)
+            self._entries[key] = blob
+            self._size += len(blob)
+
+            # Evict least recently used tables until we are back under budget
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+                self.evictions += 1
+        return True
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'size_bytes': self._size,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
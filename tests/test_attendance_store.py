@@ -0,0 +1,59 @@
+from attendance_store import AttendanceStore, sheet_metadata
+from attendance_table import table_from_rows
+from synthetic_sheets import synthetic_rows
+
+
+def title(*rows):
+    return [[text, '', ''] for text in rows] + [['', '', '']]
+
+
+def test_section_in_sheet_title():
+    # uploads/input.pdf: the section is part of the sheet title
+    meta = sheet_metadata(title('SHRI G. S. INSTITUTE OF TECHNOLOGY & SCIENCE, INDORE',
+                                'SESSION : July-December 2024; Semester "A"',
+                                'III YEAR ATTENDANCE SHEET SECTION A(till 31/08/2024 )',
+                                'Note: Please fill the attendance till 31/08/2024.'))
+    assert meta['section'] == 'A'
+    assert meta['session'] == 'July-December 2024'
+    assert meta['sheet_date'] == '2024-08-31'
+
+
+def test_section_on_its_own_row():
+    # uploads/input1.pdf and 2.pdf: "SECTION: A" is a row of its own
+    meta = sheet_metadata(title('DEPARTMENT OF COMPUTER ENGINEERING',
+                                'SESSION : JAN-JUNE 2024; Semester "A"',
+                                'BTech. II YEAR ATTENDANCE SHEET(till 29/02/2024)',
+                                'SECTION: A'))
+    assert meta['section'] == 'A'
+    assert meta['session'] == 'JAN-JUNE 2024'
+    assert meta['sheet_date'] == '2024-02-29'
+
+
+def test_class_fields():
+    meta = sheet_metadata(title('DEPARTMENT OF COMPUTER ENGINEERING',
+                                'SESSION : JAN-JUNE 2024; Semester "A"',
+                                'BTech. II YEAR ATTENDANCE SHEET(till 29/02/2024)',
+                                'SECTION: A'))
+    assert (meta['department'], meta['semester'], meta['year']) == ('COMPUTER ENGINEERING', 'A', 'II')
+
+    meta = sheet_metadata(title('SHRI G. S. INSTITUTE OF TECHNOLOGY & SCIENCE, INDORE',
+                                'SESSION : July-December 2024; Semester "A"',
+                                'III YEAR ATTENDANCE SHEET SECTION A(till 31/08/2024 )'))
+    assert (meta['department'], meta['semester'], meta['year']) == (None, 'A', 'III')
+
+
+def snapshot_rows(year, till, students=3):
+    rows = synthetic_rows(students, 3)
+    rows[2] = [f'{year} YEAR ATTENDANCE SHEET SECTION A(till {till} )'] + rows[2][1:]
+    return rows
+
+
+def test_previous_snapshot_of_another_year_is_not_compared():
+    store = AttendanceStore(':memory:')
+    for workspace, year, till in [('third-aug', 'III', '31/08/2024'), ('second-aug', 'II', '31/08/2024'),
+                                  ('third-sep', 'III', '30/09/2024')]:
+        df, preamble = table_from_rows(snapshot_rows(year, till))
+        store.store_sheet(workspace, f'{workspace}.pdf', workspace, df, preamble=preamble)
+
+    assert store.previous_snapshot('third-sep')['workspace'] == 'third-aug'
+    assert store.previous_snapshot('second-aug') is None
@@ -0,0 +1,32 @@
+from openpyxl import load_workbook
+
+from attendance_table import table_from_rows
+from batch_report import update_batch_report, write_batch_report
+from compact_table import CompactTable
+
+
+def snapshot(attended):
+    # Two students with one TH subject; attended sets the first student's classes attended of 20
+    rows = [[''] * 9] * 5 + [['', '', '', 'DBMS', '', '', '', '', ''],
+                             ['S. No.', 'Enrollment', 'Name', 'TH', '', '', '', '', '']]
+    for n, present in enumerate([attended, 18], start=1):
+        percentage = str(round(100 * present / 20))
+        rows.append([str(n), f'0801CS22{n:04d}', f'STUDENT {n}', '20', str(present), percentage,
+                     '20', str(present), percentage])
+    return CompactTable.from_table(table_from_rows(rows)[0])
+
+
+def test_unaffected_sheets_get_the_new_counts(tmp_path):
+    previous, _ = write_batch_report(snapshot(15), str(tmp_path))
+    current = tmp_path / 'current'
+    current.mkdir()
+
+    # 15 -> 16 of 20 attended crosses nothing: no sheet is rewritten, the counts still move on
+    output, rewritten = update_batch_report(snapshot(16), previous, str(current), [])
+    assert rewritten == []
+    assert load_workbook(output)['DBMS TH']['E2'].value == 16
+
+    # 16 -> 10 drops the first student below the threshold in DBMS TH and TOTAL
+    output, rewritten = update_batch_report(snapshot(10), output, str(current), [('DBMS', 'TH'), ('TOTAL', 'TOTAL')])
+    assert rewritten == ['DBMS TH', 'TOTAL']
+    assert load_workbook(output)['TOTAL']['E2'].value == 10
@@ -0,0 +1,57 @@
+import os
+
+import pytest
+
+from attendance_table import table_from_rows
+from compact_table import CompactTable, table_bytes
+from pdf_extract import extract_table_rows
+from synthetic_sheets import synthetic_rows
+from table_cache import TableCache
+
+UPLOADS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'uploads')
+
+
+def sheet_with_repeated_header(students=4):
+    # A sheet whose "S. No., Enrollment_No, Name" header repeats mid-table, as on the
+    # later pages of uploads/input.pdf
+    rows = synthetic_rows(students, 3)
+    width = len(rows[0])
+    repeated = ['S. No.', 'Enrollment_No', 'Name'] + [''] * (width - 3)
+    return rows[:9] + [repeated, [''] * width] + rows[9:]
+
+
+def test_repeated_page_header_is_not_a_student():
+    df, _ = table_from_rows(sheet_with_repeated_header())
+    table = CompactTable.from_table(df)
+    assert list(table.enrollments()) == [f'0801CS22{i:04d}' for i in range(1, 5)]
+    assert 'ENROLLMENT_NO' not in set(table.records()['enrollment'])
+
+
+def test_names_are_cleaned():
+    df, _ = table_from_rows(synthetic_rows(2, 3))
+    assert list(CompactTable.from_table(df).names) == ['STUDENT NUMBER 1', 'STUDENT NUMBER 2']
+
+
+def test_narrow_sheet_is_a_client_error():
+    df, _ = table_from_rows([[''] * 2] * 5 + [['S. No.', 'Percentage'], ['1', '55']])
+    with pytest.raises(ValueError):
+        CompactTable.from_table(df)
+
+
+def test_columns_outside_the_blocks_are_kept_per_column():
+    df, _ = table_from_rows(synthetic_rows(3, 3))
+    df.iloc[0, 3] = None  # A block without its TH/LAB label is not one the schema knows
+    table = CompactTable.from_table(df)
+    assert list(table.extra) == list(df.columns[3:6])
+    assert all(len(values) == len(table) and values.dtype.kind == 'u' for values in table.extra.values())
+
+
+@pytest.mark.parametrize('name', ['input.pdf', 'input1.pdf', '2.pdf'])
+def test_cached_table_is_smaller_than_the_parsed_sheet(name):
+    df, _ = table_from_rows(extract_table_rows(os.path.join(UPLOADS, name), workers=1))
+    table = CompactTable.from_table(df)
+    assert table.nbytes < table_bytes(df) / 2
+    raw, compact = TableCache(), TableCache()
+    raw.put(name, df)
+    compact.put(name, table)
+    assert compact.stats()['size_bytes'] < raw.stats()['size_bytes']
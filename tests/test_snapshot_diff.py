@@ -0,0 +1,23 @@
+import pandas as pd
+
+from snapshot_diff import NEW_STUDENT, NEWLY_BELOW, UPDATED, diff_records
+
+COLUMNS = ['enrollment', 'name', 'subject', 'type', 'total', 'attended', 'percentage']
+
+
+def snapshot(*rows):
+    return pd.DataFrame([(enrollment, enrollment, 'DBMS', 'TH', total, attended, round(100 * attended / total))
+                         for enrollment, total, attended in rows], columns=COLUMNS)
+
+
+def test_only_threshold_crossings_and_new_students_are_reported():
+    previous = snapshot(('A1', 20, 18), ('A2', 20, 13))
+    # A1 moves but stays above 60%, A2 drops below it, A3 joins
+    current = snapshot(('A1', 25, 22), ('A2', 25, 14), ('A3', 5, 5))
+    changes = diff_records(previous, current, threshold=60)
+    assert dict(zip(changes['enrollment'], changes['change'])) == {'A2': NEWLY_BELOW, 'A3': NEW_STUDENT}
+
+
+def test_plain_updates_on_request():
+    changes = diff_records(snapshot(('A1', 20, 18)), snapshot(('A1', 25, 22)), threshold=60, kinds=None)
+    assert list(changes['change']) == [UPDATED]
@@ -0,0 +1,68 @@
+import gzip
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+
+# Hex digits of the upload hash appended to each workspace folder name
+WORKSPACE_HASH_CHARS = 16
+
+
+def workspace_name(filename, file_hash):
+    # Content-addressed folder name: two different sheets both called attendance.pdf
+    # get separate folders, while re-uploads of the same bytes share one
+    base_name = os.path.splitext(filename)[0]
+    return f'{base_name}-{file_hash[:WORKSPACE_HASH_CHARS]}'
+
+
+@contextmanager
+def atomic_write(path):
+    # Yield a temporary path next to `path` and rename it into place once the
+    # caller has finished writing, so readers never see a half-written file and
+    # concurrent writers of the same artifact cannot interleave
+    directory = os.path.dirname(path) or '.'
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-', suffix=os.path.splitext(path)[1])
+    os.close(fd)
+    try:
+        yield tmp_path
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def write_bytes_atomic(path, data):
+    with atomic_write(path) as tmp_path:
+        with open(tmp_path, 'wb') as output:
+            output.write(data)
+    return path
+
+
+def save_upload(upload_folder, workspace, filename, data):
+    # Store the upload inside its workspace; identical content is only written once
+    folder = os.path.join(upload_folder, workspace)
+    os.makedirs(folder, exist_ok=True)
+    file_path = os.path.join(folder, filename)
+    if not os.path.exists(file_path):
+        write_bytes_atomic(file_path, data)
+    return file_path
+
+
+def find_upload(upload_folder, workspace):
+    # The original upload of a workspace, used to rebuild artifacts on any worker
+    folder = os.path.join(upload_folder, workspace)
+    if not os.path.isdir(folder):
+        return None
+    names = [name for name in os.listdir(folder) if not name.startswith('.tmp-')]
+    return os.path.join(folder, names[0]) if names else None
+
+
+def gzip_variant(path):
+    # Pre-compressed copy next to `path` (path + '.gz'), rebuilt only when the source is newer
+    gz_path = path + '.gz'
+    if not os.path.exists(gz_path) or os.path.getmtime(gz_path) < os.path.getmtime(path):
+        with atomic_write(gz_path) as tmp_path:
+            with open(path, 'rb') as source, gzip.open(tmp_path, 'wb', compresslevel=6) as target:
+                shutil.copyfileobj(source, target)
+    return gz_path